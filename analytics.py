@@ -0,0 +1,151 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from instrumentation import cache_lookup, span
+from resample import align
+
+# Rolling analytics across every loaded series at once: z-scores, percentile
+# ranks, correlation matrices and rolling correlations against one series.
+# All of them work on the whole (rows x series) array: trailing-window sums
+# come from cumulative sums, ranks from a sliding-window view, and a window's
+# correlation matrix from a few matrix products, with pairwise-complete
+# observations as pandas' DataFrame.corr() would use. Like pandas' rolling,
+# windows are trailing and include the current row, and need `min_periods`
+# observations (the full window by default).
+
+ANALYTICS_CACHE_SIZE = 32
+RANK_CHUNK_ROWS = 256
+_analytics_cache = OrderedDict()
+_analytics_cache_lock = threading.Lock()
+
+
+def _values(df):
+    x = df.to_numpy(dtype="float64")
+    valid = ~np.isnan(x)
+    # centering each column keeps the sums of squares well conditioned
+    counts = valid.sum(axis=0)
+    center = np.where(counts > 0, np.where(valid, x, 0).sum(axis=0) / np.maximum(counts, 1), 0)
+    return np.where(valid, x - center, 0), valid
+
+
+# Sums over trailing windows of `window` rows (shorter at the start)
+def _window_sums(a, window):
+    sums = np.cumsum(a, axis=0)
+    sums[window:] -= sums[:-window].copy()
+    return sums
+
+
+# Pearson correlation from pairwise-complete sums; NaN where a series is
+# (numerically) constant or there are fewer than min_periods pairs
+def _correlation(n, sx, sy, sxx, syy, sxy, min_periods):
+    var_x, var_y = n * sxx - sx * sx, n * syy - sy * sy
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr = np.clip((n * sxy - sx * sy) / np.sqrt(var_x * var_y), -1, 1)
+    corr[(n < max(min_periods, 2)) | ~(var_x > 1e-12 * n * sxx) | ~(var_y > 1e-12 * n * syy)] = np.nan
+    return corr
+
+
+def rolling_zscores(df, window, min_periods=None):
+    min_periods = window if min_periods is None else min_periods
+    x, valid = _values(df)
+    n = _window_sums(valid.astype("float64"), window)
+    s1, s2 = _window_sums(x, window), _window_sums(x * x, window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = s1 / n
+        std = np.sqrt(np.maximum(s2 - s1 * mean, 0) / (n - 1))
+        z = (x - mean) / std
+    z[~valid | (n < max(min_periods, 2)) | ~(std > 1e-12)] = np.nan
+    return pd.DataFrame(z, index=df.index, columns=df.columns)
+
+
+# Percentile rank (0-1) of each value within its trailing window, ties
+# averaged, as pandas' rolling(window).rank(pct=True)
+def rolling_percentile_ranks(df, window, min_periods=None):
+    min_periods = window if min_periods is None else min_periods
+    x = df.to_numpy(dtype="float64")
+    padded = np.vstack([np.full((window - 1, x.shape[1]), np.nan), x])
+    windows = sliding_window_view(padded, window, axis=0)
+    ranks = np.full(x.shape, np.nan)
+    for start in range(0, len(x), RANK_CHUNK_ROWS):
+        chunk = windows[start:start + RANK_CHUNK_ROWS]
+        current = x[start:start + RANK_CHUNK_ROWS, :, None]
+        below = (chunk < current).sum(axis=2)
+        equal = (chunk == current).sum(axis=2)
+        count = (~np.isnan(chunk)).sum(axis=2)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rank = (below + (equal + 1) / 2) / count
+        rank[(count < min_periods) | np.isnan(current[..., 0])] = np.nan
+        ranks[start:start + RANK_CHUNK_ROWS] = rank
+    return pd.DataFrame(ranks, index=df.index, columns=df.columns)
+
+
+# Correlation matrix of every pair of series over the `window` rows ending at
+# `end` (the last row by default)
+def correlation_matrix(df, window, end=None, min_periods=None):
+    min_periods = window if min_periods is None else min_periods
+    rows = (df if end is None else df.loc[:end]).iloc[-window:]
+    x, valid = _values(rows)
+    m = valid.astype("float64")
+    n = m.T @ m
+    sx = x.T @ m
+    sxx = (x * x).T @ m
+    corr = _correlation(n, sx, sx.T, sxx, sxx.T, x.T @ x, min_periods)
+    return pd.DataFrame(corr, index=df.columns, columns=df.columns)
+
+
+# Rolling correlation of `target` with every series, one row per date
+def rolling_correlation(df, window, target, min_periods=None):
+    min_periods = window if min_periods is None else min_periods
+    x, valid = _values(df)
+    column = df.columns.get_loc(target)
+    y, y_valid = x[:, [column]], valid[:, [column]]
+    m = (valid & y_valid).astype("float64")
+    n = _window_sums(m, window)
+    sx, sy = _window_sums(x * m, window), _window_sums(y * m, window)
+    sxx, syy = _window_sums(x * x * m, window), _window_sums(y * y * m, window)
+    corr = _correlation(n, sx, sy, sxx, syy, _window_sums(x * y * m, window), min_periods)
+    return pd.DataFrame(corr, index=df.index, columns=df.columns)
+
+
+# Regime of each z-score: 1 above +threshold, -1 below -threshold, else 0
+def regimes(zscores, threshold=1.0):
+    return np.sign(zscores.where(zscores.abs() > threshold, 0))
+
+
+ANALYSES = {
+    "zscores": rolling_zscores,
+    "ranks": rolling_percentile_ranks,
+    "correlation": correlation_matrix,
+    "pair": rolling_correlation,
+}
+
+
+# All loaded series on one frequency, each as of the period's end
+def basis_frame(stores, frequency):
+    names = [name for store in stores.values() for name in store.columns]
+    return align(stores, names, frequency, "end")
+
+
+# Memoized analysis of every loaded series, keyed by data version, analysis,
+# frequency, window length and options. Results are shared; do not mutate.
+def analyze(stores, kind, frequency, window, **options):
+    versions = tuple(store.attrs.get("data_version") for store in stores.values())
+    key = (versions, kind, frequency, window, tuple(sorted((k, str(v)) for k, v in options.items())))
+    with _analytics_cache_lock:
+        result = _analytics_cache.get(key)
+        if result is not None:
+            _analytics_cache.move_to_end(key)
+    cache_lookup("analytics", result is not None)
+    if result is not None:
+        return result
+    with span("analytics", kind=kind, frequency=frequency, window=window):
+        result = ANALYSES[kind](basis_frame(stores, frequency), window, **options)
+    with _analytics_cache_lock:
+        _analytics_cache[key] = result
+        while len(_analytics_cache) > ANALYTICS_CACHE_SIZE:
+            _analytics_cache.popitem(last=False)
+    return result
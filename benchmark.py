@@ -0,0 +1,207 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+# Offline benchmark suite: fetch throughput against the local FRED stub,
+# transform time (full and incremental), figure build/serialize time and
+# end-to-end script-run time of the dashboard, over synthetic series.
+#
+#     python benchmark.py --series-counts 45,500,5000 --length 600 --output bench.json
+#     python benchmark.py --compare baseline.json --output bench.json
+#
+# Project modules are imported inside main(), after the store and snapshot
+# directories have been pointed at a scratch location.
+
+FREQ_CODES = {"quarterly": "QS", "monthly": "MS", "weekly": "W-SAT"}
+REGRESSION_THRESHOLD = 1.2
+
+
+def timed(func, repeat=1):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def synthetic_series(length, frequency, seed):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("1947-01-01", periods=length, freq=FREQ_CODES[frequency])
+    return pd.Series(100 + rng.standard_normal(length).cumsum(), index=index)
+
+
+# Wide frame with the registry's raw columns of a frequency, padded with
+# synthetic columns up to `count`
+def synthetic_frame(frequency, count, length):
+    from registry import series_codes
+    names = list(series_codes(frequency))
+    names += [f"Synthetic {frequency} {i}" for i in range(max(count - len(names), 0))]
+    return pd.DataFrame({name: synthetic_series(length, frequency, i) for i, name in enumerate(names)})
+
+
+# Each count gets its own empty store, so the cold run fetches every series
+# rather than skipping those stored by a smaller count
+def bench_fetch(count, length, max_workers, store_dir):
+    import data_loader
+    from fred_stub import FredStubServer
+    from series_store import SeriesStore
+    series = {f"SYN{i:05d}": synthetic_series(length, "monthly", i) for i in range(count)}
+    shared_store, data_loader.store = data_loader.store, SeriesStore(store_dir)
+    with FredStubServer(series) as stub:
+        data_loader.configure(api_key="benchmark", base_url=stub.base_url, max_workers=max_workers,
+                              requests_per_minute=10 ** 9)
+        items = [(code, code) for code in series]
+        cold = timed(lambda: data_loader.refresh_series(items))
+        warm = timed(lambda: data_loader.refresh_series(items))
+        requests = stub.request_count
+        data_loader.get_engine().close()
+    data_loader.store = shared_store
+    return {
+        "cold_seconds": cold,
+        "cold_series_per_second": count / cold,
+        "unchanged_refresh_seconds": warm,
+        "stub_requests": requests,
+    }
+
+
+def bench_transform(count, length, repeat):
+    from data_transformer import transform_monthly_data
+    df = synthetic_frame("monthly", count, length)
+    previous = transform_monthly_data(df.iloc[:-1])
+    # a refresh that also revised the last two years (the delta fetch's window)
+    revised = df.copy()
+    revised.iloc[-24:] += 0.1
+    return {
+        "full_seconds": timed(lambda: transform_monthly_data(df), repeat),
+        "incremental_one_row_seconds": timed(lambda: transform_monthly_data(df, previous=previous), repeat),
+        "incremental_revised_window_seconds": timed(lambda: transform_monthly_data(revised, previous=previous), repeat),
+    }
+
+
+def bench_figures(length, repeat):
+    import charts
+    df = synthetic_frame("weekly", 1, length)
+    column = df.columns[0]
+
+    def build():
+        charts.clear_figure_cache()
+        return charts.plot_weekly_line_chart(df, [column], title=column)
+
+    fig = build()
+    return {
+        "build_seconds": timed(build, repeat),
+        "cached_build_seconds": timed(lambda: charts.plot_weekly_line_chart(df, [column], title=column), repeat),
+        "serialize_seconds": timed(fig.to_json, repeat),
+        "payload_bytes": len(fig.to_json()),
+        "full_resolution_payload_bytes": len(charts.plot_weekly_line_chart(
+            df, [column], title=column, max_points=None).to_json()),
+    }
+
+
+def bench_page(count, length, repeat):
+    from streamlit.testing.v1 import AppTest
+    from snapshot import write_snapshot
+    lengths = {"quarterly": max(length // 3, 8), "monthly": length, "weekly": length * 4}
+    frames = []
+    for frequency in ("quarterly", "monthly", "weekly"):
+        frames.append(synthetic_frame(frequency, count // 3, lengths[frequency]))
+    from data_transformer import transform_quarterly_data, transform_monthly_data, transform_weekly_data
+    write_snapshot((transform_quarterly_data(frames[0]), transform_monthly_data(frames[1]),
+                    transform_weekly_data(frames[2])))
+
+    app = AppTest.from_file("us_data.py", default_timeout=600)
+    results = {"first_run_seconds": timed(app.run)}
+    if app.exception:
+        raise RuntimeError(f"dashboard raised: {app.exception[0].value}")
+    for section in ("Labor Market", "Monetary Metrics", "Fiscal Metrics", "Debtonomics",
+                    "Workforce Flows", "Custom Charts"):
+        app.radio(key="section").set_value(section)
+        app.run()
+        results[f"{section} seconds"] = timed(app.run, repeat)
+    return results
+
+
+def compare(current, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    regressions = []
+    for scenario, groups in current.items():
+        for group, metrics in groups.items():
+            for metric, value in metrics.items():
+                old = baseline.get(scenario, {}).get(group, {}).get(metric)
+                if not metric.endswith("seconds") or not old:
+                    continue
+                ratio = value / old
+                flag = "  REGRESSION" if ratio > REGRESSION_THRESHOLD else ""
+                print(f"  {scenario} {group}.{metric}: {old:.4f}s -> {value:.4f}s ({ratio:.2f}x){flag}")
+                if flag:
+                    regressions.append(f"{scenario} {group}.{metric}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark fetch, transform, chart and page latency offline.")
+    parser.add_argument("--series-counts", default="45,500", help="comma-separated series counts (e.g. 45,500,5000)")
+    parser.add_argument("--length", type=int, default=600, help="observations per monthly series")
+    parser.add_argument("--repeat", type=int, default=5, help="repetitions per timing (median is reported)")
+    parser.add_argument("--max-workers", type=int, default=10)
+    parser.add_argument("--skip-page", action="store_true", help="skip the end-to-end dashboard run")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    args = parser.parse_args(argv)
+
+    scratch = tempfile.mkdtemp(prefix="macro-bench-")
+    os.environ["MACRO_STORE_DIR"] = os.path.join(scratch, "store")
+    os.environ["MACRO_SNAPSHOT_DIR"] = os.path.join(scratch, "snapshot")
+    os.environ.setdefault("FRED_API_KEY", "benchmark")
+    # the page run serves the synthetic snapshot; a refresher thread would
+    # check it against live FRED
+    os.environ["MACRO_BACKGROUND_REFRESH"] = "0"
+
+    results = {}
+    for count in (int(c) for c in args.series_counts.split(",")):
+        print(f"Benchmarking {count} series x {args.length} observations...")
+        scenario = {
+            "fetch": bench_fetch(count, args.length, args.max_workers, os.path.join(scratch, f"fetch-{count}")),
+            "transform": bench_transform(count, args.length, args.repeat),
+            "figure": bench_figures(args.length * 4, args.repeat),
+        }
+        if not args.skip_page:
+            scenario["page"] = bench_page(count, args.length, args.repeat)
+        results[f"{count}_series"] = scenario
+        for group, metrics in scenario.items():
+            for metric, value in metrics.items():
+                print(f"  {group}.{metric}: {value:.4f}" if isinstance(value, float) else f"  {group}.{metric}: {value}")
+
+    output = {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(output, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare)
+        if regressions:
+            print(f"{len(regressions)} regression(s) above {REGRESSION_THRESHOLD}x")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
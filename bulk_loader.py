@@ -0,0 +1,157 @@
+import argparse
+import concurrent.futures
+import sys
+import time
+
+import data_loader
+from fetch_engine import FRED_REQUESTS_PER_MINUTE
+from instrumentation import increment, span
+
+# Bulk loading of whole FRED releases or categories (e.g. all JOLTS series,
+# release 192, or all H.8 series, release 22) into the local series store:
+#
+#     python bulk_loader.py release 192
+#     python bulk_loader.py category 32241 --max-in-flight 4
+#
+# Registering pages through the release/category series list and records
+# every series in the store manifest with status "pending" (or "done" when
+# the stored copy is already at the listed last_updated). Loading then
+# fetches the pending series with at most `max_in_flight` in flight; each one
+# is written to its Parquet file as soon as it arrives and dropped, so peak
+# memory does not grow with the number of series. Manifest progress is saved
+# every CHECKPOINT_EVERY series, and an interrupted load resumes with the
+# series that are still pending.
+
+SOURCE_KINDS = ("release", "category")
+MAX_IN_FLIGHT = 8
+CHECKPOINT_EVERY = 100
+
+
+def source_key(kind, source_id):
+    return f"{kind}:{source_id}"
+
+
+# Records every series of a release or category in the manifest;
+# returns (number registered, number already up to date)
+def register_source(kind, source_id):
+    store = data_loader.store
+    source = source_key(kind, source_id)
+    registered = current = 0
+    with span("bulk_register", source=source) as progress, store.batch():
+        for page in data_loader.get_engine().iter_series_pages(kind, source_id):
+            for info in page:
+                code = info["id"]
+                up_to_date = (
+                    store.last_date(code) is not None
+                    and store.get_meta(code, "last_updated") == info.get("last_updated")
+                )
+                sources = sorted(set(store.get_meta(code, "sources") or []) | {source})
+                store.update_meta(
+                    code, title=info.get("title"), frequency=info.get("frequency_short"), units=info.get("units"),
+                    listed_updated=info.get("last_updated"), sources=sources,
+                    status="done" if up_to_date else "pending",
+                )
+                registered += 1
+                current += up_to_date
+            store.flush()
+        progress.set(registered=registered, current=current)
+    return registered, current
+
+
+# Codes registered under a source, optionally only those with a given status
+def source_series(kind, source_id, status=None):
+    source = source_key(kind, source_id)
+    return [
+        code for code, entry in data_loader.store.items()
+        if source in entry.get("sources", ()) and (status is None or entry.get("status") == status)
+    ]
+
+
+# {title: code} of the loaded series of a source, e.g. to pass to data_loader.fetch_series
+def registered_series(kind, source_id):
+    store = data_loader.store
+    return {store.get_meta(code, "title") or code: code for code in source_series(kind, source_id, "done")}
+
+
+def _load_one(code):
+    store = data_loader.store
+    _, series, error = data_loader.fetch_single_series((store.get_meta(code, "title") or code, code))
+    if error is None:
+        store.update_meta(code, status="done", last_updated=store.get_meta(code, "listed_updated"))
+    else:
+        store.update_meta(code, status="failed", error=error)
+    increment("bulk_series_total", result="failed" if error else "loaded")
+    # only the outcome leaves the worker; the series itself is already on disk
+    return code, 0 if series is None else len(series), error
+
+
+# Fetches every registered series of a source that is not done yet, with at
+# most max_in_flight requests outstanding. Returns a report dict.
+def load_source(kind, source_id, max_in_flight=MAX_IN_FLIGHT, retry_failed=True):
+    store = data_loader.store
+    statuses = ("pending", "failed") if retry_failed else ("pending",)
+    todo = [code for status in statuses for code in source_series(kind, source_id, status)]
+    executor = data_loader.get_engine().executor
+    loaded, failed, observations = 0, {}, 0
+    with span("bulk_load", source=source_key(kind, source_id)) as progress, store.batch():
+        codes = iter(todo)
+        in_flight = set()
+        while True:
+            while len(in_flight) < max_in_flight:
+                code = next(codes, None)
+                if code is None:
+                    break
+                in_flight.add(executor.submit(_load_one, code))
+            if not in_flight:
+                break
+            done, in_flight = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                code, count, error = future.result()
+                if error is None:
+                    loaded += 1
+                    observations += count
+                else:
+                    failed[code] = error
+                if (loaded + len(failed)) % CHECKPOINT_EVERY == 0:
+                    store.flush()
+        progress.set(loaded=loaded, failed=len(failed), observations=observations)
+    return {
+        "requested": len(todo),
+        "loaded": loaded,
+        "failed": failed,
+        "observations": observations,
+        "remaining": len(source_series(kind, source_id, "pending")),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load every series of a FRED release or category into the local store.")
+    parser.add_argument("kind", choices=SOURCE_KINDS)
+    parser.add_argument("source_id")
+    parser.add_argument("--config", help="TOML file with an api_key entry (default: FRED_API_KEY, then .streamlit/secrets.toml)")
+    parser.add_argument("--max-in-flight", type=int, default=MAX_IN_FLIGHT, help="series fetched concurrently")
+    parser.add_argument("--requests-per-minute", type=int, default=FRED_REQUESTS_PER_MINUTE, help="FRED rate limit for this process")
+    parser.add_argument("--resume", action="store_true", help="skip re-listing the source; load what is still pending")
+    parser.add_argument("--register-only", action="store_true", help="list and register the series without fetching")
+    args = parser.parse_args(argv)
+
+    data_loader.configure(config_path=args.config, max_workers=args.max_in_flight,
+                          requests_per_minute=args.requests_per_minute)
+    started = time.perf_counter()
+    if not args.resume:
+        registered, current = register_source(args.kind, args.source_id)
+        print(f"Registered {registered} series from {args.kind} {args.source_id} ({current} already up to date)")
+    if args.register_only:
+        return 0
+    report = load_source(args.kind, args.source_id, max_in_flight=args.max_in_flight)
+    print(
+        f"Loaded {report['loaded']} of {report['requested']} series ({report['observations']:,} observations) "
+        f"in {time.perf_counter() - started:.1f}s; {len(report['failed'])} failed"
+    )
+    for code, error in list(report["failed"].items())[:20]:
+        print(f"  FAILED {code}: {error}")
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
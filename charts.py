@@ -1,5 +1,10 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
 import plotly.graph_objects as go
-from utils import get_yaxis_label
+from instrumentation import cache_lookup, span
+from utils import content_hash, get_yaxis_label
 import pandas as pd
 
 # Helpers for formatting datetime index
@@ -11,28 +16,146 @@ def format_month(date):
     return f"{date.year}M{date.month}"
 
 def format_week(date):
-    return f"{date.isocalendar().year}-W{date.isocalendar().week:02d}"
+    iso = date.isocalendar()
+    return f"{iso.year}-W{iso.week:02d}"
+
+# Vectorized versions over a whole DatetimeIndex
+def quarter_labels(index):
+    return index.year.astype(str) + "Q" + index.quarter.astype(str)
+
+def month_labels(index):
+    return index.year.astype(str) + "M" + index.month.astype(str)
+
+def week_labels(index):
+    iso = index.isocalendar()
+    return (iso["year"].astype(str) + "-W" + iso["week"].astype(str).str.zfill(2)).to_numpy()
+
+
+# Level-of-detail downsampling so long series (weekly claims back to 1967)
+# are not shipped to the browser point by point. Both methods keep the first
+# and last point and preserve extremes such as the 2020 claims spike.
+DEFAULT_MAX_POINTS = 1000  # about one point per horizontal pixel of a 1000px chart
+
+# Largest-Triangle-Three-Buckets: one point per bucket, the one forming the
+# largest triangle with the previously kept point and the next bucket's mean
+def lttb_indices(x, y, n_out):
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            avg_x = x[end:edges[i + 2]].mean()
+            avg_y = y[end:edges[i + 2]].mean()
+        else:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+# Min-max buckets: the lowest and highest point of each of n_out / 2 buckets
+def minmax_indices(y, n_out):
+    n = len(y)
+    if n_out >= n or n_out < 2:
+        return np.arange(n)
+    edges = np.linspace(0, n, n_out // 2 + 1).astype(np.int64)
+    starts, sizes = edges[:-1], np.diff(edges)
+    positions = starts[:, None] + np.arange(sizes.max())
+    in_bucket = positions < edges[1:, None]
+    values = y[np.minimum(positions, n - 1)]
+    lows = starts + np.where(in_bucket, values, np.inf).argmin(axis=1)
+    highs = starts + np.where(in_bucket, values, -np.inf).argmax(axis=1)
+    return np.unique(np.concatenate([[0, n - 1], lows, highs]))
+
+def downsample(series, max_points=DEFAULT_MAX_POINTS, method="lttb"):
+    series = series.dropna()
+    if max_points is None or len(series) <= max_points:
+        return series
+    y = series.to_numpy(dtype="float64")
+    if method == "minmax":
+        indices = minmax_indices(y, max_points)
+    else:
+        x = pd.to_datetime(series.index).asi8.astype("float64")
+        indices = lttb_indices(x, y, max_points)
+    return series.iloc[indices]
+
+# Zoom-aware mode: full resolution inside visible_range=(start, end), and a
+# small downsampled context on either side so panning out still shows the shape
+def downsample_for_view(series, max_points=DEFAULT_MAX_POINTS, method="lttb", visible_range=None):
+    if visible_range is None:
+        return downsample(series, max_points, method)
+    start, end = pd.Timestamp(visible_range[0]), pd.Timestamp(visible_range[1])
+    index = pd.to_datetime(series.index)
+    context_points = None if max_points is None else max(max_points // 10, 3)
+    return pd.concat([
+        downsample(series[index < start], context_points, method),
+        series[(index >= start) & (index <= end)].dropna(),
+        downsample(series[index > end], context_points, method),
+    ])
+
+
+# Bounded LRU cache of built figures, keyed by a hash of the plotted data plus
+# the chart parameters. Cached figures are shared between reruns and sessions,
+# so callers must not mutate them.
+FIGURE_CACHE_SIZE = 256
+_figure_cache = OrderedDict()
+_figure_cache_lock = threading.Lock()
+
+def cached_figure(key, build, name="figure"):
+    with _figure_cache_lock:
+        fig = _figure_cache.get(key)
+        if fig is not None:
+            _figure_cache.move_to_end(key)
+    cache_lookup("figure", fig is not None)
+    if fig is not None:
+        return fig
+    with span("figure_build", chart=name):
+        fig = build()
+    with _figure_cache_lock:
+        _figure_cache[key] = fig
+        while len(_figure_cache) > FIGURE_CACHE_SIZE:
+            _figure_cache.popitem(last=False)
+    return fig
+
+def clear_figure_cache():
+    with _figure_cache_lock:
+        _figure_cache.clear()
 
 
-def _plot_time_series(df, columns, title, xaxis_title, yaxis_title, date_formatter):
+def _plot_time_series(df, columns, title, xaxis_title, yaxis_title, label_func,
+                      max_points=DEFAULT_MAX_POINTS, method="lttb", visible_range=None):
+    # only the plotted columns are touched, never a copy of the whole frame
+    data = df[[col for col in columns if col in df.columns]]
+    view = (max_points, method, None if visible_range is None else tuple(map(str, visible_range)))
+    key = (content_hash(data), tuple(columns), title, xaxis_title, yaxis_title, label_func.__name__, view)
+    return cached_figure(key, lambda: _build_time_series(
+        data, columns, title, xaxis_title, yaxis_title, label_func, max_points, method, visible_range), name=title)
+
+def _build_time_series(data, columns, title, xaxis_title, yaxis_title, label_func,
+                       max_points, method, visible_range):
     y_label = get_yaxis_label(columns[0])
     fig = go.Figure()
-    df_formatted = df.copy()
-    df_formatted.index = pd.to_datetime(df_formatted.index)
-    df_formatted["display_x"] = df_formatted.index.to_series().apply(date_formatter)
+    data = data.set_axis(pd.to_datetime(data.index))
 
 
-    for col in columns:
-        if col in df.columns:
-            fig.add_trace(go.Scatter(
-                x=df_formatted.index,  # keep actual datetime
-                y=df[col],
-                mode='lines',
-                name=col,
-                line=dict(width=2),
-                text=df_formatted["display_x"],  # add formatted label
-                hovertemplate="%{text}<br>%{y:.2f}<extra></extra>"  # custom hover
-            ))
+    for col in data.columns:
+        series = data[col]
+        if max_points is not None and len(series) > max_points:
+            series = downsample_for_view(series, max_points, method, visible_range)
+        fig.add_trace(go.Scatter(
+            x=series.index,  # keep actual datetime
+            y=series,
+            mode='lines',
+            name=col,
+            line=dict(width=2),
+            text=label_func(series.index),  # add formatted label
+            hovertemplate="%{text}<br>%{y:.2f}<extra></extra>"  # custom hover
+        ))
 
 
     fig.update_layout(
@@ -60,17 +183,123 @@ def _plot_time_series(df, columns, title, xaxis_title, yaxis_title, date_formatt
         hovermode="x unified",
         margin=dict(l=40, r=40, t=60, b=40)
     )
+    if visible_range is not None:
+        fig.update_xaxes(range=[pd.Timestamp(visible_range[0]), pd.Timestamp(visible_range[1])])
 
     return fig
 
+# Series longer than max_points are downsampled (method "lttb" or "minmax");
+# max_points=None sends every point. visible_range=(start, end) zooms the x axis
+# and keeps full resolution inside that window.
+
 # Quarterly chart
-def plot_quarterly_line_chart(df, columns, title="Quarterly Chart", yaxis_title="Value"):
-    return _plot_time_series(df, columns, title, "Quarter", yaxis_title, format_quarter)
+def plot_quarterly_line_chart(df, columns, title="Quarterly Chart", yaxis_title="Value", **view):
+    return _plot_time_series(df, columns, title, "Quarter", yaxis_title, quarter_labels, **view)
 
 # Monthly chart
-def plot_monthly_line_chart(df, columns, title="Monthly Chart", yaxis_title="Value"):
-    return _plot_time_series(df, columns, title, "Month", yaxis_title, format_month)
+def plot_monthly_line_chart(df, columns, title="Monthly Chart", yaxis_title="Value", **view):
+    return _plot_time_series(df, columns, title, "Month", yaxis_title, month_labels, **view)
 
 # Weekly chart
-def plot_weekly_line_chart(df, columns, title="Weekly Chart", yaxis_title="Value"):
-    return _plot_time_series(df, columns, title, "Week", yaxis_title, format_week)
+def plot_weekly_line_chart(df, columns, title="Weekly Chart", yaxis_title="Value", **view):
+    return _plot_time_series(df, columns, title, "Week", yaxis_title, week_labels, **view)
+
+
+# Overlay of many series in one WebGL (Scattergl) figure, for comparing dozens
+# of long series without one SVG figure each. normalize is None, "index" (each
+# series rebased to 100 at its first value in view) or "zscore" (standardized
+# over its history); independent_axes gives every series its own y scale, with
+# the axes of the first two drawn and the rest autoscaled without ticks.
+OVERLAY_NORMALIZATIONS = (None, "index", "zscore")
+OVERLAY_LABELS = {
+    "quarterly": (quarter_labels, "Quarter"),
+    "monthly": (month_labels, "Month"),
+    "weekly": (week_labels, "Week"),
+}
+OVERLAY_COLORS = (
+    "#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd", "#8c564b",
+    "#e377c2", "#7f7f7f", "#bcbd22", "#17becf",
+)
+
+def normalize_series(series, normalize, visible_range=None):
+    if normalize is None:
+        return series
+    if normalize == "index":
+        base = series if visible_range is None else series[pd.to_datetime(series.index) >= pd.Timestamp(visible_range[0])]
+        base = base.dropna()
+        if base.empty or base.iloc[0] == 0:
+            return series * np.nan
+        return series / base.iloc[0] * 100
+    if normalize == "zscore":
+        std = series.std()
+        if not std > 0:
+            return series * np.nan
+        return (series - series.mean()) / std
+    raise ValueError(f"Unknown normalization: {normalize}")
+
+def plot_overlay_chart(df, columns, title="Overlay", frequency="monthly", yaxis_title=None,
+                       normalize=None, independent_axes=False,
+                       max_points=DEFAULT_MAX_POINTS, method="lttb", visible_range=None):
+    data = df[[col for col in columns if col in df.columns]]
+    view = (max_points, method, None if visible_range is None else tuple(map(str, visible_range)))
+    key = ("overlay", content_hash(data), tuple(data.columns), title, frequency, yaxis_title,
+           normalize, independent_axes, view)
+    return cached_figure(key, lambda: _build_overlay(
+        data, title, frequency, yaxis_title, normalize, independent_axes, max_points, method, visible_range),
+        name="overlay")
+
+def _build_overlay(data, title, frequency, yaxis_title, normalize, independent_axes,
+                   max_points, method, visible_range):
+    label_func, xaxis_title = OVERLAY_LABELS[frequency]
+    data = data.set_axis(pd.to_datetime(data.index))
+    axis_style = dict(showgrid=False, showline=True, linewidth=1, linecolor="black", zeroline=False)
+    layout = {}
+    fig = go.Figure()
+    for i, col in enumerate(data.columns):
+        series = normalize_series(data[col].dropna(), normalize, visible_range)
+        if max_points is not None and len(series) > max_points:
+            series = downsample_for_view(series, max_points, method, visible_range)
+        color = OVERLAY_COLORS[i % len(OVERLAY_COLORS)]
+        axis = "y" if i == 0 or not independent_axes else f"y{i + 1}"
+        fig.add_trace(go.Scattergl(
+            x=series.index,
+            y=series.to_numpy(),
+            mode="lines",
+            name=col,
+            yaxis=axis,
+            line=dict(width=1.5, color=color),
+            text=label_func(series.index),
+            hovertemplate="%{text}<br>%{y:.2f}<extra>" + col + "</extra>",
+        ))
+        if independent_axes and i > 0:
+            layout[f"yaxis{i + 1}"] = dict(
+                axis_style, overlaying="y", side="right", title=dict(text=col if i == 1 else None, font=dict(color=color)),
+                visible=i == 1, tickfont=dict(color=color),
+            )
+
+    if normalize == "index":
+        y_title = "Index (first value = 100)"
+    elif normalize == "zscore":
+        y_title = "Standard deviations from mean"
+    elif independent_axes and len(data.columns):
+        y_title = data.columns[0]
+    else:
+        y_title = yaxis_title or (get_yaxis_label(data.columns[0]) if len(data.columns) else "Value")
+    first_color = OVERLAY_COLORS[0] if independent_axes and normalize is None else "#222"
+    fig.update_layout(
+        title=dict(text=title, x=0.2, font=dict(size=20)),
+        xaxis=dict(axis_style, title=xaxis_title, ticks="outside"),
+        yaxis=dict(axis_style, title=dict(text=y_title, font=dict(color=first_color))),
+        plot_bgcolor="white",
+        paper_bgcolor="white",
+        font=dict(family="Times New Roman", size=14, color="#222"),
+        hoverlabel=dict(font=dict(family="Times New Roman")),
+        hovermode="x",
+        legend=dict(orientation="h", yanchor="top", y=-0.15),
+        height=600,
+        margin=dict(l=40, r=60, t=60, b=40),
+        **layout,
+    )
+    if visible_range is not None:
+        fig.update_xaxes(range=[pd.Timestamp(visible_range[0]), pd.Timestamp(visible_range[1])])
+    return fig
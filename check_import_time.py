@@ -0,0 +1,81 @@
+import argparse
+import ast
+import os
+import subprocess
+import sys
+
+# Cold-start import budget for the dashboard. Imports every module-level
+# import of us_data.py in a fresh interpreter under `python -X importtime`,
+# then checks the total against a budget and that none of the lazily loaded
+# heavy modules were pulled in at startup. Run from CI:
+#
+#     python check_import_time.py --budget-ms 1500
+#
+# Exits with status 1 when the budget is exceeded or a lazy module leaks.
+
+APP_SCRIPT = "us_data.py"
+IMPORT_BUDGET_MS = 1500
+LAZY_MODULES = ("matplotlib", "plotly.express", "seaborn", "requests", "tenacity")
+
+
+# Module names imported at the top level of the app script
+def startup_imports(path=APP_SCRIPT):
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), path)
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+
+# Runs the imports under -X importtime; returns ({module: cumulative_us}, total_us)
+def measure_imports(modules):
+    code = "\n".join(f"import {module}" for module in modules)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(APP_SCRIPT)) or ".",
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import failed:\n{result.stderr[-2000:]}")
+    cumulative, total = {}, 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative_us, name = line.split("|")
+        if not cumulative_us.strip().isdigit():
+            continue
+        module = name.strip()
+        cumulative[module] = int(cumulative_us)
+        # top-level entries are indented by a single space
+        if name.startswith(" ") and not name.startswith("  "):
+            total += int(cumulative_us)
+    return cumulative, total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the dashboard's cold-start import time.")
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=10, help="slowest modules to list")
+    args = parser.parse_args(argv)
+
+    modules = startup_imports()
+    cumulative, total = measure_imports(modules)
+    total_ms = total / 1000
+    print(f"Startup imports: {', '.join(modules)}")
+    for module in sorted(cumulative, key=cumulative.get, reverse=True)[:args.top]:
+        print(f"  {cumulative[module] / 1000:>8.1f} ms  {module}")
+    print(f"Total: {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+
+    leaked = [module for module in LAZY_MODULES if module in cumulative]
+    if leaked:
+        print(f"FAIL: lazily loaded modules imported at startup: {', '.join(leaked)}")
+    if total_ms > args.budget_ms:
+        print("FAIL: import time over budget")
+    return 1 if leaked or total_ms > args.budget_ms else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
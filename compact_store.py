@@ -0,0 +1,144 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# Compact in-memory representation of one frequency's data: each series is a
+# pair of contiguous arrays (observation dates, values) with no NaN padding,
+# instead of one wide outer-joined frame. Aligned DataFrame views are built on
+# demand for the columns a caller needs, and the most recently used ones are
+# memoized so every session shares a single copy.
+# MACRO_VALUE_DTYPE=float32 halves the value arrays at the cost of precision.
+VALUE_DTYPE = os.environ.get("MACRO_VALUE_DTYPE", "float64")
+VIEW_CACHE_SIZE = int(os.environ.get("MACRO_VIEW_CACHE_SIZE", "64"))
+
+
+class CompactStore:
+    def __init__(self, arrays, attrs=None, dtype=VALUE_DTYPE):
+        # arrays: {name: (datetime64[ns] dates, values)}, in column order
+        self.arrays = arrays
+        self.attrs = dict(attrs or {})
+        self.dtype = dtype
+        # {column names: view}, least recently used first
+        self._views = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_frame(cls, df, dtype=VALUE_DTYPE):
+        index = pd.to_datetime(df.index).to_numpy(dtype="datetime64[ns]")
+        arrays = {}
+        for name in df.columns:
+            values = df[name].to_numpy(dtype="float64")
+            present = ~np.isnan(values)
+            arrays[name] = (np.ascontiguousarray(index[present]), np.ascontiguousarray(values[present], dtype=dtype))
+        return cls(arrays, df.attrs, dtype)
+
+    # Serialized form: all series concatenated into one (date, value) record
+    # batch, with the per-series layout and attrs in the schema metadata
+    def to_record_batch(self):
+        names = self.columns
+        lengths = [len(self.arrays[name][1]) for name in names]
+        dates = np.concatenate([self.arrays[name][0] for name in names]) if names else np.array([], dtype="datetime64[ns]")
+        values = np.concatenate([self.arrays[name][1] for name in names]) if names else np.array([], dtype=self.dtype)
+        metadata = {"layout": json.dumps({"names": names, "lengths": lengths}), "attrs": json.dumps(self.attrs, default=str)}
+        return pa.record_batch([pa.array(dates), pa.array(values)], names=["date", "value"], metadata=metadata)
+
+    # Inverse of to_record_batch. The arrays are zero-copy views of the batch,
+    # so a batch read from a memory-mapped file is shared with other processes.
+    @classmethod
+    def from_record_batch(cls, batch):
+        metadata = batch.schema.metadata
+        layout = json.loads(metadata[b"layout"])
+        dates = batch.column(0).to_numpy(zero_copy_only=True)
+        values = batch.column(1).to_numpy(zero_copy_only=True)
+        arrays, offset = {}, 0
+        for name, length in zip(layout["names"], layout["lengths"]):
+            arrays[name] = (dates[offset:offset + length], values[offset:offset + length])
+            offset += length
+        return cls(arrays, json.loads(metadata[b"attrs"]), str(values.dtype))
+
+    @property
+    def columns(self):
+        return list(self.arrays)
+
+    def __contains__(self, name):
+        return name in self.arrays
+
+    # One series without NaNs, e.g. for metric cards; no alignment needed
+    def series(self, name):
+        dates, values = self.arrays[name]
+        return pd.Series(values, index=pd.DatetimeIndex(dates), name=name)
+
+    # Wide frame of `names` (every series when None) aligned on the union of
+    # their dates. Views are memoized per column set and shared, so callers
+    # must not mutate them.
+    def view(self, names=None):
+        key = tuple(self.columns if names is None else [name for name in names if name in self.arrays])
+        with self._lock:
+            df = self._views.get(key)
+            if df is not None:
+                self._views.move_to_end(key)
+                return df
+        df = self._build_view(list(key))
+        with self._lock:
+            self._views[key] = df
+            while len(self._views) > VIEW_CACHE_SIZE:
+                self._views.popitem(last=False)
+        return df
+
+    def _build_view(self, names):
+        if not names:
+            return pd.DataFrame(index=pd.DatetimeIndex([]))
+        index = np.unique(np.concatenate([self.arrays[name][0] for name in names]))
+        data = {}
+        for name in names:
+            dates, values = self.arrays[name]
+            column = np.full(len(index), np.nan, dtype=self.dtype)
+            column[np.searchsorted(index, dates)] = values
+            data[name] = column
+        df = pd.DataFrame(data, index=pd.DatetimeIndex(index))
+        df.attrs = dict(self.attrs)
+        return df
+
+    # Series with at least one observation
+    def nonempty_columns(self):
+        return [name for name, (dates, _) in self.arrays.items() if len(dates)]
+
+    # (first, last) observation date over all series, or (None, None)
+    def date_range(self):
+        dates = [dates for dates, _ in self.arrays.values() if len(dates)]
+        if not dates:
+            return None, None
+        return pd.Timestamp(min(d[0] for d in dates)), pd.Timestamp(max(d[-1] for d in dates))
+
+    # Bytes held by the memoized views
+    def views_nbytes(self):
+        with self._lock:
+            views = list(self._views.values())
+        return sum(int(df.memory_usage(index=True).sum()) for df in views)
+
+    def nbytes(self):
+        return sum(dates.nbytes + values.nbytes for dates, values in self.arrays.values())
+
+    def observations(self):
+        return sum(len(values) for _, values in self.arrays.values())
+
+
+# Memory footprint per frequency: the compact arrays and the views built
+# from them so far (reporting never builds one)
+def memory_report(stores):
+    rows = []
+    for frequency, store in stores.items():
+        rows.append({
+            "frequency": frequency,
+            "series": len(store.arrays),
+            "observations": store.observations(),
+            "compact_mb": store.nbytes() / 1e6,
+            "views": len(store._views),
+            "views_mb": store.views_nbytes() / 1e6,
+        })
+    return pd.DataFrame(rows).set_index("frequency")
@@ -1,94 +1,230 @@
-from fredapi import Fred
+import logging
+import os
+import threading
+import tomllib
+
 import pandas as pd
-import streamlit as st
-import concurrent.futures
-
-# Load API key from Streamlit secrets
-FRED_API_KEY = st.secrets["api_key"]
-fred = Fred(api_key=FRED_API_KEY)
-
-# Quarterly series
-quarterly_series = {
-    'GDP': 'GDP',
-    'Real GDP': 'GDPC1',
-    'Imports': 'IMPGS',
-    'Exports': 'EXPGS',
-    'Federal Debt Total Public Debt': 'GFDEBTN',
-    'Federal Debt Held by Federal Reserve Banks': 'FDHBFRBN',
-    'Federal Debt Held by Private Investors': 'FDHBPIN',
-    'Federal Debt Held by the Public': 'FYGFDPUN',
-    'Federal Debt Held by Foreign and International Investors': 'FDHBFIN',
-    'Federal Debt Held by Agencies and Trusts': 'FDHBATN',
-    'Federal Debt: Total Public Debt as Percent of GDP': 'GFDEGDQ188S',
-    'Delinquency Rate on Business Loans, All Commercial Banks': 'DRBLACBS',
-    'Delinquency Rate on Credit Card Loans, All Commercial Banks': 'DRCCLACBS',
-    'Delinquency Rate on Consumer Loans, All Commercial Banks': 'DRCLACBS',
-    'Delinquency Rate on All Loans, All Commercial Banks': 'DRALACBN'
-}
+from instrumentation import increment, log_event, span
+from registry import INDICATORS, QUARTERLY, MONTHLY, WEEKLY, series_codes
+from series_store import SeriesStore
+from vintage_store import VintageStore
 
-# Monthly series
-monthly_series = {
-    'Unemployment Rate': 'UNRATE',
-    'CPI': 'CPIAUCSL',
-    'PCE': 'PCE',
-    'Labor Force Participation Rate': 'CIVPART',
-    'Job Openings Total Nonfarm': 'JTSJOL',
-    'Unemployment Level': 'UNEMPLOY',
-    'Federal Funds Effective Rate': 'FEDFUNDS',
-    'M1': 'M1SL',
-    'M2': 'M2SL',
-    'Monthly Transition Rate of All U.S. Workers From Employment to Non-Employment Due to a Layoff': 'EMELASA',
-    'Monthly Transition Rate of Prime-Age U.S. Workers From Employment to Non-Employment Due to a Layoff': 'EMELPSA',
-    'Monthly Transition Rate of All U.S. Workers From Employment to Non-Employment Due to a Quit': 'EMEQASA',
-    'Monthly Transition Rate of Prime-Age U.S. Workers From Employment to Non-Employment Due to a Quit': 'EMEQPSA',
-    'Monthly Share of All U.S. Workers Who Leave the Labor Force After a Layoff': 'EMSHRNLA',
-    'Monthly Share of Prime-Age U.S. Workers Who Leave the Labor Force After a Layoff': 'EMSHRNLP',
-    'Monthly Share of All U.S. Workers Who Leave the Labor Force After a Quit': 'EMSHRNQA',
-    'Monthly Share of Prime-Age U.S. Workers Who Leave the Labor Force After a Quit': 'EMSHRNQP',
-    'University of Michigan: Consumer Sentiment': 'UMCSENT',
-    'University of Michigan: Inflation Expectation': 'MICH',
-    'Economic Policy Uncertainty Index for United States': 'USEPUINDXM',
-    'Average Hourly Earnings of All Employees, Total Private': 'CES0500000003',
-    'Average Weekly Hours of All Employees, Total Private': 'AWHAETP',
-    'All Employees Total Nonfarm': 'PAYEMS'
-}
+SECRETS_PATH = os.path.join(".streamlit", "secrets.toml")
+
+store = SeriesStore()
+vintages = VintageStore()
 
-# Weekly series
-weekly_series = {
-    'Initial Claims': 'ICSA',
-    'Continued Claims (Insured Unemployment)': 'CCSA',
-    '4-Week Moving Average of Initial Claims': 'IC4WSA',
-    '4-Week Moving Average of Continued Claims (Insured Unemployment)': 'CC4WSA'
+# Series codes by frequency, from the indicator registry
+quarterly_series = series_codes(QUARTERLY)
+monthly_series = series_codes(MONTHLY)
+weekly_series = series_codes(WEEKLY)
+
+# A delta fetch re-reads this much history before the last stored date and
+# replaces it, so routine revisions (recent months of payrolls, the last
+# three years of GDP in the annual update) are picked up
+REVISION_WINDOW = {
+    QUARTERLY: pd.DateOffset(years=3),
+    MONTHLY: pd.DateOffset(years=2),
+    WEEKLY: pd.DateOffset(years=1),
 }
+# FRED's frequency_short of series outside the registry (e.g. bulk loads)
+FREQUENCY_SHORT = {"Q": QUARTERLY, "M": MONTHLY, "W": WEEKLY}
+# The whole history is re-fetched when the last full fetch is older than
+# this, for comprehensive revisions reaching past the window
+FULL_REFETCH_DAYS = int(os.environ.get("MACRO_FULL_REFETCH_DAYS", "90"))
+_code_frequencies = {ind.code: ind.frequency for ind in INDICATORS if ind.code}
 
-# Fetch a single series (used in parallel)
-def fetch_single_series(name_code_tuple):
-    name, code = name_code_tuple
+_engine = None
+_engine_lock = threading.Lock()
+
+# FRED API key from the FRED_API_KEY environment variable, then the api_key
+# entry of a TOML config file (the Streamlit secrets file by default), then
+# st.secrets when running inside Streamlit
+def get_api_key(config_path=None):
+    key = os.environ.get("FRED_API_KEY")
+    if key:
+        return key
+    path = config_path or SECRETS_PATH
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            key = tomllib.load(f).get("api_key")
+        if key:
+            return key
     try:
-        series = fred.get_series(code)
-        print(f"{name} latest date: {series.index[-1]}")
-        return (name, series)
-    except Exception as e:
-        print(f"Failed to load {name} ({code}): {e}")
-        return (name, None)
+        import streamlit as st
+        return st.secrets["api_key"]
+    except Exception:
+        # a replay never reaches FRED, so no key is needed
+        if os.environ.get("FRED_MODE") == "replay":
+            return "replay"
+        raise RuntimeError(f"No FRED API key found: set FRED_API_KEY or add api_key to {path}") from None
+
+# Create the shared fetch engine explicitly (e.g. from the CLI with a config file)
+def configure(api_key=None, config_path=None, **engine_options):
+    global _engine
+    from fetch_engine import FredEngine
+    with _engine_lock:
+        _engine = FredEngine(api_key=api_key or get_api_key(config_path), **engine_options)
+    return _engine
+
+# The shared fetch engine, created on first use
+def get_engine():
+    # requests/tenacity are imported with the engine, on first fetch
+    global _engine
+    from fetch_engine import FredEngine
+    with _engine_lock:
+        if _engine is None:
+            _engine = FredEngine(api_key=get_api_key())
+        return _engine
+
+def revision_window(code):
+    frequency = _code_frequencies.get(code) or FREQUENCY_SHORT.get(store.get_meta(code, "frequency"))
+    return REVISION_WINDOW.get(frequency, REVISION_WINDOW[MONTHLY])
+
+def full_refetch_due(code):
+    fetched_at = store.get_meta(code, "full_fetched_at")
+    return fetched_at is None or pd.Timestamp.now() - pd.Timestamp(fetched_at) > pd.Timedelta(days=FULL_REFETCH_DAYS)
+
+# Fetch a single series (used in parallel). Reads the local store first and
+# asks FRED for observations from a revision window before the last stored
+# date, which replace the stored ones. The whole history is fetched when
+# nothing is stored, when `full` is set, or every FULL_REFETCH_DAYS.
+# Returns (name, series, error); series falls back to the stored history on failure.
+def fetch_single_series(name_code_tuple, full=False):
+    name, code = name_code_tuple
+    last_date = store.last_date(code)
+    full = full or last_date is None or full_refetch_due(code)
+    with span("fetch_series", series=code) as current:
+        current.set(name=name, full=full)
+        try:
+            if full:
+                new_obs = get_engine().get_series(code)
+                series = store.write(code, new_obs)
+                store.update_meta(code, full_fetched_at=pd.Timestamp.now().isoformat(timespec="seconds"))
+            else:
+                start = last_date - revision_window(code)
+                new_obs = get_engine().get_series(code, observation_start=start)
+                series = store.replace_from(code, start, new_obs)
+            current.set(result="fetched", new_observations=len(new_obs), latest_date=series.index[-1])
+            increment("fred_series_fetch_total", result="fetched")
+            return (name, series, None)
+        except Exception as e:
+            current.set(result="failed", error=str(e))
+            increment("fred_series_fetch_total", result="failed")
+            # fall back to whatever is already on disk
+            return (name, store.read(code), str(e))
 
-# Fetch series in parallel
-def fetch_series(series_dict):
-    data = {}
-    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-        results = executor.map(fetch_single_series, series_dict.items())
-    for name, series in results:
+# Build a frame from fetch results. Failed or empty series are kept as empty
+# columns and listed in df.attrs["failed_series"] instead of being dropped.
+def build_frame(results):
+    data, failed = {}, {}
+    for name, series, error in results:
         if series is not None and not series.empty:
             data[name] = series
         else:
-            print(f"⚠️ {name} returned empty or failed.")
+            log_event("empty_series", logging.WARNING, name=name)
+            data[name] = pd.Series(dtype="float64")
+        if error is not None:
+            failed[name] = error
     df = pd.DataFrame(data)
     df.index = pd.to_datetime(df.index)
+    df.attrs["failed_series"] = failed
     return df
 
-# Master loader function for all frequencies
+# Upstream last_updated timestamp of a series, or None if the lookup failed
+def fetch_last_updated(name_code_tuple):
+    name, code = name_code_tuple
+    with span("fetch_metadata", series=code) as current:
+        try:
+            return get_engine().get_series_info(code)["last_updated"]
+        except Exception as e:
+            current.set(result="failed", error=str(e))
+            return None
+
+# Refresh a set of series. A cheap metadata pass compares every series'
+# FRED last_updated with the one recorded in the store, and only series whose
+# timestamp moved (or that are not stored yet) get an observations fetch.
+# A moved timestamp may also mean revised history, which the revision window
+# of the delta fetch picks up.
+# Returns ({name: (name, series, error)}, report).
+def refresh_series(items):
+    with span("refresh") as current:
+        results, report = _refresh_series(list(items))
+        current.set(**{key: len(value) for key, value in report.items() if not isinstance(value, int)})
+    increment("fred_series_fetch_total", len(report["skipped"]), result="unchanged")
+    return results, report
+
+def _refresh_series(items):
+    upstream = dict(zip([code for _, code in items], get_engine().map(fetch_last_updated, items)))
+    results, skipped, to_fetch = {}, [], []
+    for name, code in items:
+        stored_updated = store.get_meta(code, "last_updated")
+        if upstream[code] is not None and upstream[code] == stored_updated and store.last_date(code) is not None:
+            skipped.append(name)
+            results[name] = (name, store.read(code), None)
+        else:
+            to_fetch.append((name, code))
+    for (name, code), result in zip(to_fetch, get_engine().map(fetch_single_series, to_fetch)):
+        results[name] = result
+        if result[2] is None and upstream[code] is not None:
+            store.update_meta(code, last_updated=upstream[code])
+    failed = {name: result[2] for name, result in results.items() if result[2] is not None}
+    report = {
+        "skipped": skipped,
+        "fetched": [name for name, _ in to_fetch if name not in failed],
+        "failed": failed,
+        "metadata_requests": len(items),
+        "observation_requests": len(to_fetch),
+        "observation_requests_saved": len(skipped),
+    }
+    return results, report
+
+# Fetch series in parallel. With `names`, only those series are refreshed
+# and the others are read from the store without any requests.
+def fetch_series(series_dict, names=None):
+    items = series_dict.items() if names is None else [(name, series_dict[name]) for name in names]
+    results, report = refresh_series(items)
+    for name, code in series_dict.items():
+        if name not in results:
+            results[name] = (name, store.read(code), None)
+    df = build_frame([results[name] for name in series_dict])
+    df.attrs["refresh_report"] = report
+    return df
+
+# Master loader function for all frequencies. All series go through the
+# shared engine pool in one pass rather than one frequency at a time.
 def fetch_data_by_frequency():
-    df_quarterly = fetch_series(quarterly_series)
-    df_monthly = fetch_series(monthly_series)
-    df_weekly = fetch_series(weekly_series)
+    frequencies = [quarterly_series, monthly_series, weekly_series]
+    items = [item for series_dict in frequencies for item in series_dict.items()]
+    results, report = refresh_series(items)
+    df_quarterly, df_monthly, df_weekly = (
+        build_frame([results[name] for name in series_dict]) for series_dict in frequencies
+    )
+    for df in (df_quarterly, df_monthly, df_weekly):
+        df.attrs["refresh_report"] = report
     return df_quarterly, df_monthly, df_weekly
+
+# Download the ALFRED release history of every series into the vintage store
+def fetch_single_vintage(name_code_tuple):
+    name, code = name_code_tuple
+    try:
+        vintages.write(code, get_engine().get_series_vintages(code))
+        return (name, None)
+    except Exception as e:
+        log_event("fetch_vintages_failed", logging.WARNING, name=name, series=code, error=str(e))
+        return (name, str(e))
+
+def fetch_vintages(series_dicts=None):
+    if series_dicts is None:
+        series_dicts = [quarterly_series, monthly_series, weekly_series]
+    items = [item for series_dict in series_dicts for item in series_dict.items()]
+    return {name: error for name, error in get_engine().map(fetch_single_vintage, items) if error is not None}
+
+# Point-in-time frames: the quarterly, monthly and weekly data as published
+# on `date`, rebuilt from the vintage store without touching FRED
+def as_of(date):
+    return (
+        vintages.frame_as_of(quarterly_series, date),
+        vintages.frame_as_of(monthly_series, date),
+        vintages.frame_as_of(weekly_series, date),
+    )
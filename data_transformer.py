@@ -1,46 +1,89 @@
-def transform_quarterly_data(df):
-    df = df.copy()
-    
-    # scale federal debt columns to billions
-    scale_to_billions = [
-    'Federal Debt Total Public Debt',
-    'Federal Debt Held by the Public',
-    'Federal Debt Held by Agencies and Trusts'
-    ]   
-    
-    for col in scale_to_billions:
-       if col in df.columns:
-        df[col] /= 1_000  # Convert millions to billions
-    
-    # compute GDP deflator
-    if 'GDP' in df.columns and 'Real GDP' in df.columns:
-       df['GDP deflator'] = (df['GDP'] / df['Real GDP']) * 100
+import numpy as np
+import pandas as pd
 
-    if 'Real GDP' in df.columns:
-       df['Real GDP Growth'] = df['Real GDP'].pct_change(periods=4) * 100
+from instrumentation import span
+from registry import QUARTERLY, MONTHLY, WEEKLY, REGISTRY, IndicatorGraph, lookback
 
-    if 'Exports' in df.columns and 'Imports' in df.columns:
-       df['Net Exports'] = df['Exports'] / df['Imports']
+# Derived columns (GDP deflator, YoY inflation, V/U ratio, ...) are declared in
+# registry.py; these helpers evaluate every available one for a frequency.
+# Views that need a single indicator can use IndicatorGraph(...).get(name).
 
-    return df
+def is_derived_column(name):
+    return name in REGISTRY and REGISTRY[name].is_derived
 
-def transform_monthly_data(df):
-    df = df.copy()
+# Raw columns of a frame as a float array, scaled by their registry divisors
+# the same way IndicatorGraph scales them
+def scaled_values(df):
+    values = df.to_numpy(dtype="float64")
+    divisors = [REGISTRY[col].divisor if col in REGISTRY and REGISTRY[col].divisor else 1 for col in df.columns]
+    if any(divisor != 1 for divisor in divisors):
+        values = values / np.array(divisors, dtype="float64")
+    return values
 
-    # compute inflations
-    if 'CPI' in df.columns:
-        df['CPI YoY Inflation'] = (df['CPI']-df['CPI'].shift(12))/df['CPI'].shift(12)
+# First date at which the raw data differs from the raw columns of a previous
+# transformed frame (new rows, or revised/filled-in values), or None if nothing
+# changed. Dates missing from the new index, or inserted before the end of the
+# previous one, count as a change at the first date. A transformed frame holds
+# its raw columns first, so they are compared as one block.
+def first_changed_date(previous, df, frequency):
+    raw_cols = [col for col in previous.columns if not is_derived_column(col)]
+    if (list(df.columns) != raw_cols or list(previous.columns[:len(raw_cols)]) != raw_cols
+            or len(df) < len(previous) or not df.index[:len(previous)].equals(previous.index)):
+        return df.index.min()
+    new = scaled_values(df.iloc[:len(previous)])
+    old = previous.iloc[:, :len(raw_cols)].to_numpy(dtype="float64")
+    changed = ((new != old) & ~(np.isnan(new) & np.isnan(old))).any(axis=1)
+    if changed.any():
+        return df.index[np.argmax(changed)]
+    if len(df) > len(previous):
+        return df.index[len(previous)]
+    return None
 
-    if 'PCE' in df.columns:
-        df['PCE YoY Inflation'] = (df['PCE']-df['PCE'].shift(12))/df['PCE'].shift(12)
+# Incremental mode: recompute only the rows from `start` onward plus the trailing
+# window each derived column looks back over, reusing `previous` for the rest.
+# Rows before `start` are unchanged, so the raw columns of the tail are the
+# scaled new rows and only the derived columns go through IndicatorGraph.
+# The result matches transform_frame(df, frequency) exactly.
+def transform_incremental(previous, df, frequency, start):
+    derived_cols = [col for col in previous.columns if is_derived_column(col)]
+    position = previous.index.searchsorted(start)
+    context_start = max(0, position - max((lookback(col) for col in derived_cols), default=0))
+    context = df.iloc[context_start:]
+    graph = IndicatorGraph({frequency: context})
+    tail = np.empty((len(df) - position, len(previous.columns)))
+    tail[:, :len(df.columns)] = scaled_values(context)[position - context_start:]
+    for i, col in enumerate(derived_cols, start=len(df.columns)):
+        tail[:, i] = graph.get(col).reindex(context.index).to_numpy(dtype="float64")[position - context_start:]
+    values = np.concatenate([previous.to_numpy(dtype="float64")[:position], tail])
+    result = pd.DataFrame(values, index=df.index, columns=previous.columns)
+    result.attrs = dict(df.attrs)
+    return result
 
-    if 'Job Openings Total Nonfarm' in df.columns and 'Unemployment Level' in df.columns:
-       df['Job Vacancy-to-Unemployment Ratio'] = df['Job Openings Total Nonfarm'] / df['Unemployment Level'] 
+def transform_frame(df, frequency, previous=None):
+    with span("transform", frequency=frequency) as current:
+        current.set(rows=len(df), columns=len(df.columns))
+        if previous is not None and not previous.empty:
+            start = first_changed_date(previous, df, frequency)
+            if start is None:
+                current.set(mode="unchanged")
+                result = previous.copy()
+                result.attrs = dict(df.attrs)
+                return result
+            # rows before `start` must be unchanged, so the previous frame can be
+            # reused up to it; a change in the first half is cheaper recomputed whole
+            if previous.index.searchsorted(start) > len(df) // 2:
+                current.set(mode="incremental", start=start)
+                return transform_incremental(previous, df, frequency, start)
+        current.set(mode="full")
+        return IndicatorGraph({frequency: df}).frame(frequency)
 
-    return df
+# `previous` is the transformed frame from the last load; when given, only the
+# rows that changed since then (plus their look-back window) are recomputed.
+def transform_quarterly_data(df, previous=None):
+    return transform_frame(df, QUARTERLY, previous)
 
-def transform_weekly_data(df):
-    df = df.copy() ## placeholder for more data in the future
-
-    return df
+def transform_monthly_data(df, previous=None):
+    return transform_frame(df, MONTHLY, previous)
 
+def transform_weekly_data(df, previous=None):
+    return transform_frame(df, WEEKLY, previous)
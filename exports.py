@@ -0,0 +1,103 @@
+import io
+import threading
+from collections import OrderedDict
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from instrumentation import cache_lookup, span
+from utils import content_hash
+
+# Export service for the sidebar downloads. Exports are streamed chunk by
+# chunk (CSV rows, Parquet row groups, Arrow record batches) and the finished
+# bytes are cached per data version and export options, so reruns that do not
+# change the selection never reserialize the frames.
+
+EXPORT_FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+    "Arrow IPC": ("arrow", "application/vnd.apache.arrow.file"),
+}
+CHUNK_ROWS = 5_000
+EXPORT_CACHE_SIZE = 32
+_export_cache = OrderedDict()
+_export_cache_lock = threading.Lock()
+
+
+# Version key for a frame; stored in df.attrs["data_version"] when data loads
+def data_version(df):
+    version = df.attrs.get("data_version")
+    return version if version is not None else content_hash(df)
+
+
+def select(df, columns=None, start=None, end=None):
+    if columns:
+        df = df[[col for col in columns if col in df.columns]]
+    if start is not None or end is not None:
+        df = df.loc[start:end]
+    return df
+
+
+# Yields the export in chunks of encoded bytes
+def iter_export(df, fmt="CSV", chunk_rows=CHUNK_ROWS):
+    if fmt == "CSV":
+        for offset in range(0, max(len(df), 1), chunk_rows):
+            yield df.iloc[offset:offset + chunk_rows].to_csv(header=offset == 0).encode("utf-8")
+        return
+    schema = pa.Schema.from_pandas(df.iloc[:0])
+    sink = io.BytesIO()
+    if fmt == "Parquet":
+        writer = pq.ParquetWriter(sink, schema)
+        write = writer.write_table
+    elif fmt == "Arrow IPC":
+        writer = pa.ipc.new_file(sink, schema)
+        write = writer.write_table
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+    with writer:
+        for offset in range(0, len(df), chunk_rows):
+            write(pa.Table.from_pandas(df.iloc[offset:offset + chunk_rows], schema=schema))
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+    yield sink.getvalue()
+
+
+def _export_key(version, fmt, columns, start, end):
+    return (version, fmt, tuple(columns or ()), str(start), str(end))
+
+
+# Export bytes already built for a data version and selection, or None; lets
+# a caller skip building the frame until an export is asked for
+def cached_export(version, fmt="CSV", columns=None, start=None, end=None):
+    if version is None:
+        return None
+    with _export_cache_lock:
+        return _export_cache.get(_export_key(version, fmt, columns, start, end))
+
+
+# Cached export bytes for a frame and a selection of columns and dates
+def export_bytes(df, fmt="CSV", columns=None, start=None, end=None):
+    key = _export_key(data_version(df), fmt, columns, start, end)
+    with _export_cache_lock:
+        data = _export_cache.get(key)
+        if data is not None:
+            _export_cache.move_to_end(key)
+    cache_lookup("export", data is not None)
+    if data is not None:
+        return data
+    with span("export", format=fmt) as current:
+        buffer = io.BytesIO()
+        for chunk in iter_export(select(df, columns, start, end), fmt):
+            buffer.write(chunk)
+        data = buffer.getvalue()
+        current.set(bytes=len(data))
+    with _export_cache_lock:
+        _export_cache[key] = data
+        while len(_export_cache) > EXPORT_CACHE_SIZE:
+            _export_cache.popitem(last=False)
+    return data
+
+
+def export_file_name(label, fmt):
+    return f"{label.lower()}_data.{EXPORT_FORMATS[fmt][0]}"
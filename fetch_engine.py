@@ -0,0 +1,183 @@
+import json
+import os
+import threading
+import time
+import concurrent.futures
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from tenacity import (
+    Retrying,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_random_exponential,
+)
+
+from instrumentation import annotate, increment
+
+FRED_BASE_URL = os.environ.get("FRED_BASE_URL", "https://api.stlouisfed.org/fred")
+FRED_REQUESTS_PER_MINUTE = 120
+FRED_OBSERVATION_LIMIT = 100000
+FRED_LIST_LIMIT = 1000
+FRED_SERIES_LISTS = {"release": "release/series", "category": "category/series"}
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class FredRequestError(Exception):
+    pass
+
+
+class RetryableRequestError(FredRequestError):
+    pass
+
+
+# Token bucket shared by all worker threads of one engine. It starts with a
+# small burst (a sixth of the minute's budget) and refills at the rest of the
+# budget, so no 60 second window exceeds `rate_per_minute`. The limit is per
+# process: processes fetching at the same time (the dashboard, refresher.py,
+# prefetch.py, bulk_loader.py) should share FRED's 120/min between them.
+class TokenBucket:
+    def __init__(self, rate_per_minute=FRED_REQUESTS_PER_MINUTE, capacity=None):
+        self.capacity = capacity if capacity is not None else max(rate_per_minute / 6, 1)
+        self.rate = max(rate_per_minute - self.capacity, 1) / 60.0
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# Transport: how a request reaches FRED. get(path, params) returns
+# (status code, body bytes). The HTTP transport is one pooled keep-alive
+# session; replay.py wraps or replaces it for record/replay (FRED_MODE).
+class HttpTransport:
+    def __init__(self, base_url=FRED_BASE_URL, max_workers=10, timeout=10):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, path, params):
+        try:
+            response = self.session.get(f"{self.base_url}/{path}", params=params, timeout=self.timeout)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise RetryableRequestError(str(e)) from e
+        return response.status_code, response.content
+
+    def close(self):
+        self.session.close()
+
+
+# Single fetch engine for every FRED request: one transport, one bounded
+# worker pool, one rate limiter.
+class FredEngine:
+    def __init__(self, api_key, base_url=FRED_BASE_URL, max_workers=10,
+                 requests_per_minute=FRED_REQUESTS_PER_MINUTE, timeout=10, max_retries=5, transport=None):
+        self.api_key = api_key
+        self.max_retries = max_retries
+        self.bucket = TokenBucket(requests_per_minute)
+        if transport is None:
+            transport = HttpTransport(base_url, max_workers, timeout)
+            if os.environ.get("FRED_MODE", "live") != "live":
+                from replay import transport_from_env
+                transport = transport_from_env(transport)
+        self.transport = transport
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+
+    def _get_once(self, path, params):
+        self.bucket.acquire()
+        params = dict(params, api_key=self.api_key, file_type="json")
+        status, content = self.transport.get(path, params)
+        increment("fred_requests_total", status=status)
+        increment("fred_response_bytes_total", len(content))
+        annotate(requests=1, bytes=len(content))
+        if status in RETRY_STATUS_CODES:
+            raise RetryableRequestError(f"HTTP {status} for {path}")
+        if status != 200:
+            text = content.decode("utf-8", errors="replace")
+            try:
+                message = json.loads(text).get("error_message", text)
+            except ValueError:
+                message = text
+            raise FredRequestError(f"HTTP {status} for {path}: {message}")
+        return json.loads(content)
+
+    def request(self, path, **params):
+        retrying = Retrying(
+            retry=retry_if_exception_type(RetryableRequestError),
+            wait=wait_random_exponential(multiplier=0.5, max=30),
+            stop=stop_after_attempt(self.max_retries),
+            reraise=True,
+        )
+        try:
+            return retrying(self._get_once, path, params)
+        finally:
+            retries = retrying.statistics.get("attempt_number", 1) - 1
+            if retries:
+                increment("fred_retries_total", retries, path=path)
+                annotate(retries=retries)
+
+    def get_series(self, code, observation_start=None):
+        params = {"series_id": code}
+        if observation_start is not None:
+            params["observation_start"] = pd.Timestamp(observation_start).strftime("%Y-%m-%d")
+        observations = self.request("series/observations", **params)["observations"]
+        values = pd.to_numeric([obs["value"] for obs in observations], errors="coerce")
+        index = pd.to_datetime([obs["date"] for obs in observations])
+        return pd.Series(values, index=index, dtype="float64")
+
+    # Full ALFRED release history: one row per value and the real-time period
+    # during which it was the published value
+    def get_series_vintages(self, code):
+        pages, offset = [], 0
+        while True:
+            observations = self.request(
+                "series/observations", series_id=code, realtime_start="1776-07-04",
+                realtime_end="9999-12-31", limit=FRED_OBSERVATION_LIMIT, offset=offset,
+            )["observations"]
+            pages.extend(observations)
+            if len(observations) < FRED_OBSERVATION_LIMIT:
+                break
+            offset += FRED_OBSERVATION_LIMIT
+        return pd.DataFrame(pages, columns=["realtime_start", "realtime_end", "date", "value"])
+
+    # Series metadata (title, frequency, last_updated, ...) from FRED's series endpoint
+    def get_series_info(self, code):
+        seriess = self.request("series", series_id=code).get("seriess", [])
+        if not seriess:
+            raise FredRequestError(f"No info exists for series id: {code}")
+        return seriess[0]
+
+    # Series listed under a FRED release or category (kind "release" or
+    # "category"), yielded one page at a time so long lists are never held whole
+    def iter_series_pages(self, kind, source_id, page_size=FRED_LIST_LIMIT):
+        offset = 0
+        while True:
+            page = self.request(FRED_SERIES_LISTS[kind], **{f"{kind}_id": source_id}, limit=page_size, offset=offset)
+            seriess = page.get("seriess", [])
+            if seriess:
+                yield seriess
+            offset += len(seriess)
+            if not seriess or offset >= int(page.get("count", 0)):
+                break
+
+    # Run fn over items on the shared pool, preserving order
+    def map(self, fn, items):
+        return list(self.executor.map(fn, items))
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.transport.close()
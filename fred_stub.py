@@ -0,0 +1,147 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+# Local stand-in for the FRED series and observations endpoints, used to exercise
+# fetch_engine without network access or an API key.
+#   series: {code: pd.Series}
+#   flaky:  {code: number of 503 responses to send before succeeding}
+#   last_updated: {code: FRED-style timestamp served by the series endpoint}
+#   vintages: {code: DataFrame of date, value, realtime_start, realtime_end}
+#             served when a real-time period is requested
+#   releases / categories: {id: [codes]} served by the release/series and
+#             category/series list endpoints
+
+
+class FredStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        stub = self.server.stub
+        with stub.lock:
+            stub.request_count += 1
+        if url.path.endswith("/series/observations"):
+            self._observations(params)
+        elif url.path.endswith("/release/series"):
+            self._series_list(stub.releases.get(params.get("release_id")), params)
+        elif url.path.endswith("/category/series"):
+            self._series_list(stub.categories.get(params.get("category_id")), params)
+        elif url.path.endswith("/series"):
+            self._series_info(params)
+        else:
+            self._send_json(404, {"error_code": 404, "error_message": "Not found"})
+
+    def _series_info(self, params):
+        stub = self.server.stub
+        code = params.get("series_id")
+        if code not in stub.series:
+            self._send_json(400, {"error_code": 400, "error_message": "Bad Request.  The series does not exist."})
+            return
+        self._send_json(200, {"seriess": [stub.info(code)]})
+
+    def _series_list(self, codes, params):
+        if codes is None:
+            self._send_json(400, {"error_code": 400, "error_message": "Bad Request.  The release or category does not exist."})
+            return
+        offset, limit = int(params.get("offset", 0)), int(params.get("limit", 1000))
+        seriess = [self.server.stub.info(code) for code in codes[offset:offset + limit]]
+        self._send_json(200, {"count": len(codes), "offset": offset, "limit": limit, "seriess": seriess})
+
+    def _observations(self, params):
+        stub = self.server.stub
+        code = params.get("series_id")
+        with stub.lock:
+            if stub.flaky.get(code, 0) > 0:
+                stub.flaky[code] -= 1
+                self._send_json(503, {"error_code": 503, "error_message": "Service unavailable"})
+                return
+        if code not in stub.series:
+            self._send_json(400, {"error_code": 400, "error_message": "Bad Request.  The series does not exist."})
+            return
+        series = stub.series[code]
+        if "observation_start" in params:
+            series = series[series.index >= pd.Timestamp(params["observation_start"])]
+        if "realtime_start" in params and code in stub.vintages:
+            rows = stub.vintages[code].to_dict("records")
+        else:
+            rows = [
+                {"date": date, "value": value, "realtime_start": stub.today, "realtime_end": "9999-12-31"}
+                for date, value in series.items()
+            ]
+        offset = int(params.get("offset", 0))
+        rows = rows[offset:offset + int(params.get("limit", 100000))]
+        observations = [
+            {
+                "realtime_start": str(row["realtime_start"])[:10],
+                "realtime_end": str(row["realtime_end"])[:10],
+                "date": pd.Timestamp(row["date"]).strftime("%Y-%m-%d"),
+                "value": "." if pd.isna(row["value"]) else repr(float(row["value"])),
+            }
+            for row in rows
+        ]
+        self._send_json(200, {"count": len(observations), "observations": observations})
+
+
+class FredStubServer:
+    default_last_updated = "2025-01-01 07:45:00-06"
+    today = "2025-01-01"
+
+    def __init__(self, series, flaky=None, last_updated=None, vintages=None, releases=None, categories=None,
+                 host="127.0.0.1", port=0):
+        self.series = series
+        self.flaky = dict(flaky or {})
+        self.last_updated = dict(last_updated or {})
+        self.vintages = dict(vintages or {})
+        self.releases = {str(key): list(codes) for key, codes in (releases or {}).items()}
+        self.categories = {str(key): list(codes) for key, codes in (categories or {}).items()}
+        self.request_count = 0
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), FredStubHandler)
+        self.httpd.stub = self
+        self.thread = None
+
+    def info(self, code):
+        series = self.series[code]
+        return {
+            "id": code,
+            "title": code,
+            "observation_start": series.index[0].strftime("%Y-%m-%d"),
+            "observation_end": series.index[-1].strftime("%Y-%m-%d"),
+            "last_updated": self.last_updated.get(code, self.default_last_updated),
+        }
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/fred"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,202 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Hot-path instrumentation: spans time a block of work and emit one structured
+# JSON log line each, and every span also feeds a duration summary. Counters
+# track cache hits/misses, request bytes, retries and fetch results. The
+# metrics are exposed in the Prometheus text format, written next to
+# MACRO_METRICS_FILE (e.g. for the node_exporter textfile collector) as one
+# file per process: macro.prom becomes macro.<pid>.prom, with a pid label.
+#
+#     with span("fetch_series", series=code) as current:
+#         ...
+#         current.set(result="fetched")
+#
+# Fields added with annotate() from code called inside a span (e.g. response
+# bytes in the fetch engine) are summed onto the innermost span of the thread.
+
+METRICS_PATH = os.environ.get("MACRO_METRICS_FILE")
+LOG_LEVEL = os.environ.get("MACRO_LOG_LEVEL", "INFO").upper()
+
+logger = logging.getLogger("macro")
+if not logger.handlers:
+    _handler = logging.StreamHandler(sys.stderr)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+
+_counters = {}
+_summaries = {}
+_metrics_lock = threading.Lock()
+_local = threading.local()
+
+
+def log_event(event, level=logging.INFO, **fields):
+    if logger.isEnabledFor(level):
+        logger.log(level, json.dumps({"ts": round(time.time(), 3), "event": event, **fields}, default=str))
+
+
+def _label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def increment(name, value=1, **labels):
+    key = (name, _label_key(labels))
+    with _metrics_lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+# Adds one observation to a summary (count, sum, max)
+def observe(name, value, **labels):
+    key = (name, _label_key(labels))
+    with _metrics_lock:
+        count, total, peak = _summaries.get(key, (0, 0.0, 0.0))
+        _summaries[key] = (count + 1, total + value, max(peak, value))
+
+
+def cache_lookup(cache, hit):
+    increment("cache_requests_total", cache=cache, result="hit" if hit else "miss")
+
+
+class Span:
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.fields = {}
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    def add(self, **fields):
+        for key, value in fields.items():
+            self.fields[key] = self.fields.get(key, 0) + value
+
+
+# Times the block; records `<name>_duration_seconds` and logs the span with
+# its labels and fields. An exception escaping the block marks it as an error.
+@contextmanager
+def span(name, **labels):
+    current = Span(name, labels)
+    stack = _local.__dict__.setdefault("stack", [])
+    stack.append(current)
+    started = time.perf_counter()
+    level = logging.INFO
+    try:
+        yield current
+    except Exception as e:
+        current.set(result="error", error=str(e))
+        level = logging.WARNING
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        stack.pop()
+        observe(f"{name}_duration_seconds", duration, **labels)
+        log_event(name, level, duration_ms=round(duration * 1000, 3), **labels, **current.fields)
+
+
+# Sums numeric fields onto the innermost open span of this thread, if any
+def annotate(**fields):
+    stack = getattr(_local, "stack", None)
+    if stack:
+        stack[-1].add(**fields)
+
+
+# Largest single durations of a span, by one of its labels, e.g.
+# slowest("fetch_series", "series") or slowest("tab_render", "tab")
+def slowest(name, label, n=5):
+    metric = f"{name}_duration_seconds"
+    with _metrics_lock:
+        rows = [(dict(labels).get(label), peak) for (key, labels), (_, _, peak) in _summaries.items() if key == metric]
+    return sorted(rows, key=lambda row: row[1], reverse=True)[:n]
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+# All metrics in the Prometheus text exposition format; `extra_labels`
+# ((key, value) pairs) are added to every sample
+def prometheus_text(extra_labels=()):
+    with _metrics_lock:
+        counters = {(name, labels + tuple(extra_labels)): value for (name, labels), value in _counters.items()}
+        summaries = {(name, labels + tuple(extra_labels)): value for (name, labels), value in _summaries.items()}
+    lines = []
+    for name in sorted({name for name, _ in counters}):
+        lines.append(f"# TYPE {name} counter")
+        for (key, labels), value in sorted(counters.items()):
+            if key == name:
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+    for name in sorted({name for name, _ in summaries}):
+        series = sorted((labels, values) for (key, labels), values in summaries.items() if key == name)
+        lines.append(f"# TYPE {name} summary")
+        for labels, (count, total, _) in series:
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total:.6f}")
+        lines.append(f"# TYPE {name}_max gauge")
+        for labels, (_, _, peak) in series:
+            lines.append(f"{name}_max{_format_labels(labels)} {peak:.6f}")
+    return "\n".join(lines) + "\n"
+
+
+# This process's metrics file: <path stem>.<pid><suffix>
+def process_metrics_path(path, pid=None):
+    root, ext = os.path.splitext(path)
+    return f"{root}.{os.getpid() if pid is None else pid}{ext}"
+
+
+# Drops the metrics files of processes that have exited
+def _remove_dead_process_files(path):
+    root, ext = os.path.splitext(path)
+    directory, prefix = os.path.split(root)
+    for name in os.listdir(directory or "."):
+        pid = name[len(prefix) + 1:len(name) - len(ext)] if name.startswith(prefix + ".") and name.endswith(ext) else ""
+        if not pid.isdigit() or int(pid) == os.getpid():
+            continue
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+        except OSError:
+            pass
+
+
+# Atomically writes the metrics file; a no-op when no path is configured.
+# Several processes (Streamlit workers, the refresher) each write their own
+# file, so none overwrites another's counters; per_process=False writes
+# `path` itself (for one-shot CLIs such as prefetch.py).
+def write_metrics(path=METRICS_PATH, per_process=True):
+    if not path:
+        return
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    if per_process:
+        _remove_dead_process_files(os.path.abspath(path))
+        text = prometheus_text((("pid", str(os.getpid())),))
+        path = process_metrics_path(path)
+    else:
+        text = prometheus_text()
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def reset_metrics():
+    with _metrics_lock:
+        _counters.clear()
+        _summaries.clear()
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+from registry import release_lag
+
+# Latest-values table: for every series, the last and previous non-NaN values
+# and their dates, the absolute and percent change between them, and how old
+# the last observation is. Built once per snapshot version from the compact
+# arrays, so metric cards and date listings are lookups.
+
+# A series counts as stale when its next observation is overdue: its last
+# observation is older than the time to the end of the following period plus
+# the series' release lag (registry) and a week's grace. Monthly and
+# quarterly periods are dated at their start, weekly ones at the week's end.
+NEXT_PERIOD_END_DAYS = {"quarterly": 184, "monthly": 62, "weekly": 7}
+STALE_GRACE_DAYS = 7
+
+
+def stale_after_days(name, frequency):
+    return NEXT_PERIOD_END_DAYS[frequency] + release_lag(name, frequency) + STALE_GRACE_DAYS
+
+COLUMNS = [
+    "frequency", "last_date", "last_value", "prev_date", "prev_value",
+    "change", "pct_change", "observations", "staleness_days", "stale",
+]
+
+
+# Table rows for one frequency from its compact arrays ({name: (dates,
+# values)} with no NaNs, as held by a CompactStore): only the last two
+# entries of each series are read, so no aligned frame is built
+def latest_values(arrays, frequency, today=None):
+    names = list(arrays)
+    counts = np.array([len(values) for _, values in arrays.values()], dtype="int64")
+    last_value, prev_value = np.full(len(names), np.nan), np.full(len(names), np.nan)
+    last_date = np.full(len(names), np.datetime64("NaT", "ns"))
+    prev_date = last_date.copy()
+    for i, (dates, values) in enumerate(arrays.values()):
+        if len(values):
+            last_value[i], last_date[i] = values[-1], dates[-1]
+        if len(values) > 1:
+            prev_value[i], prev_date[i] = values[-2], dates[-2]
+    last_date, prev_date = pd.DatetimeIndex(last_date), pd.DatetimeIndex(prev_date)
+    change = last_value - prev_value
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct_change = np.where(prev_value != 0, change / prev_value * 100, 0.0)
+    pct_change[counts < 2] = np.nan
+
+    today = pd.Timestamp.today().normalize() if today is None else pd.Timestamp(today)
+    staleness = (today - last_date).days.to_numpy(dtype="float64", na_value=np.nan)
+    table = pd.DataFrame({
+        "frequency": frequency,
+        "last_date": last_date,
+        "last_value": last_value,
+        "prev_date": prev_date,
+        "prev_value": prev_value,
+        "change": change,
+        "pct_change": pct_change,
+        "observations": counts,
+        "staleness_days": staleness,
+        "stale": ~(staleness <= np.array([stale_after_days(name, frequency) for name in names], dtype="float64")),
+    }, index=pd.Index(names, name="series"))
+    return table[COLUMNS]
+
+
+# Table for all frequencies, from {frequency: CompactStore}
+def latest_table(stores, today=None):
+    tables = [latest_values(store.arrays, frequency, today) for frequency, store in stores.items()]
+    if not tables:
+        return pd.DataFrame(columns=COLUMNS)
+    return pd.concat(tables)
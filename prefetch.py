@@ -0,0 +1,80 @@
+import argparse
+import sys
+import time
+
+import data_loader
+from instrumentation import METRICS_PATH, slowest, write_metrics
+from data_transformer import (
+    transform_quarterly_data,
+    transform_monthly_data,
+    transform_weekly_data,
+)
+from snapshot import SNAPSHOT_DIR, write_snapshot
+
+# Headless prefetch: fetch and transform every frequency and write the shared
+# snapshot the dashboard loads at startup. Meant for cron or container start:
+#
+#     FRED_API_KEY=... python prefetch.py
+#     python prefetch.py --config /etc/macro/fred.toml --snapshot-dir /srv/macro/snapshot
+#
+# Exits with status 1 if any series failed to refresh.
+
+
+def print_series_status(frames, report):
+    failed, skipped = report["failed"], set(report["skipped"])
+    series_dicts = (data_loader.quarterly_series, data_loader.monthly_series, data_loader.weekly_series)
+    for df, series_dict in zip(frames, series_dicts):
+        for name, code in series_dict.items():
+            series = df[name].dropna()
+            if name in failed:
+                status = "FAILED"
+            elif name in skipped:
+                status = "unchanged"
+            else:
+                status = "fetched"
+            latest = series.index.max().date() if not series.empty else "-"
+            print(f"  {status:<10} {code:<14} {len(series):>6} obs  latest {latest}  {name}")
+            if name in failed:
+                print(f"             {failed[name]}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch FRED data and write the dashboard snapshot.")
+    parser.add_argument("--config", help="TOML file with an api_key entry (default: FRED_API_KEY, then .streamlit/secrets.toml)")
+    parser.add_argument("--snapshot-dir", default=SNAPSHOT_DIR, help=f"snapshot directory (default: {SNAPSHOT_DIR})")
+    parser.add_argument("--max-workers", type=int, default=10, help="concurrent FRED requests")
+    parser.add_argument("--metrics-file", default=METRICS_PATH, help="write Prometheus metrics to this file")
+    args = parser.parse_args(argv)
+
+    data_loader.configure(config_path=args.config, max_workers=args.max_workers)
+
+    started = time.perf_counter()
+    df_quarterly, df_monthly, df_weekly = data_loader.fetch_data_by_frequency()
+    fetched = time.perf_counter()
+    frames = (
+        transform_quarterly_data(df_quarterly),
+        transform_monthly_data(df_monthly),
+        transform_weekly_data(df_weekly),
+    )
+    transformed = time.perf_counter()
+    write_snapshot(frames, args.snapshot_dir)
+    written = time.perf_counter()
+
+    report = df_quarterly.attrs["refresh_report"]
+    print("Series status:")
+    print_series_status(frames, report)
+    print(
+        f"Fetch {fetched - started:.2f}s, transform {transformed - fetched:.2f}s, "
+        f"snapshot {written - transformed:.2f}s, total {written - started:.2f}s"
+    )
+    print(
+        f"{len(report['fetched'])} fetched, {len(report['skipped'])} unchanged, "
+        f"{len(report['failed'])} failed; snapshot written to {args.snapshot_dir}"
+    )
+    print("Slowest series: " + ", ".join(f"{code} {seconds:.2f}s" for code, seconds in slowest("fetch_series", "series")))
+    write_metrics(args.metrics_file, per_process=False)
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
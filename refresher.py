@@ -0,0 +1,257 @@
+import argparse
+import datetime
+import fcntl
+import logging
+import os
+import sys
+import threading
+import time
+from zoneinfo import ZoneInfo
+
+import single_flight
+from instrumentation import increment, log_event, span, write_metrics
+from snapshot import FREQUENCY_NAMES, SNAPSHOT_DIR, current_version, open_snapshot, snapshot_meta, update_snapshot
+
+# Background refresh on the FRED release calendar. Each frequency is checked
+# after its next release slot and refreshed on its own: the new frame is
+# transformed incrementally against the one being served and swapped in as a
+# new snapshot version (the other frequencies are carried over unchanged).
+# The dashboard keeps serving the current version meanwhile, so no request
+# ever waits on FRED; a failed check keeps the last good data and is retried.
+#
+#     streamlit run us_data.py          (starts a refresher thread per process)
+#     python refresher.py               (standalone, e.g. as a service)
+#     python refresher.py --once monthly
+#
+# Only one process per snapshot directory refreshes at a time (an exclusive
+# lock on refresher.lock); the others serve what it writes.
+
+# (weekdays, time of day in New York) of the release slots, a little after
+# the releases so FRED has them. Checks are cheap when nothing moved (a
+# metadata pass; unchanged series are not re-downloaded).
+RELEASE_TIMEZONE = ZoneInfo("America/New_York")
+RELEASE_SCHEDULE = {
+    # GDP, PCE and corporate profits: BEA releases on Thursdays, 8:30 ET
+    "quarterly": ((3,), datetime.time(9, 0)),
+    # CPI, payrolls, retail sales (8:30 ET), JOLTS (10:00 ET)...: release days vary, every business day
+    "monthly": ((0, 1, 2, 3, 4), datetime.time(10, 30)),
+    # initial jobless claims: Thursdays, 8:30 ET
+    "weekly": ((3,), datetime.time(9, 0)),
+}
+POLL_SECONDS = int(os.environ.get("MACRO_REFRESH_POLL_SECONDS", "60"))
+RETRY_AFTER_SECONDS = 15 * 60
+# a slot's check that finds nothing new (FRED not updated yet) is repeated
+# this often for the rest of the release day, until RECHECK_UNTIL New York time
+RECHECK_SECONDS = 60 * 60
+RECHECK_UNTIL = datetime.time(18, 0)
+# a refresh of the same scope within this many seconds of the last one is skipped
+REFRESH_COOLDOWN_SECONDS = int(os.environ.get("MACRO_REFRESH_COOLDOWN", "300"))
+
+
+# First release slot of a frequency strictly after the `after` timestamp
+def next_release(frequency, after):
+    weekdays, at = RELEASE_SCHEDULE[frequency]
+    day = datetime.datetime.fromtimestamp(after, RELEASE_TIMEZONE).date()
+    while True:
+        slot = datetime.datetime.combine(day, at, RELEASE_TIMEZONE)
+        if day.weekday() in weekdays and slot.timestamp() > after:
+            return slot.timestamp()
+        day += datetime.timedelta(days=1)
+
+
+# When to check again after a check at `now` found nothing new: later on a
+# release day (the release may reach FRED late), else the next slot
+def next_check(frequency, now):
+    weekdays, _ = RELEASE_SCHEDULE[frequency]
+    moment = datetime.datetime.fromtimestamp(now + RECHECK_SECONDS, RELEASE_TIMEZONE)
+    today = datetime.datetime.fromtimestamp(now, RELEASE_TIMEZONE).date()
+    if moment.date() == today and today.weekday() in weekdays and moment.time() <= RECHECK_UNTIL:
+        return min(now + RECHECK_SECONDS, next_release(frequency, now))
+    return next_release(frequency, now)
+
+
+# Refreshes one frequency (or only the series in `names`) and swaps it into
+# the snapshot. Returns the new version id (None when nothing changed
+# upstream) and the refresh report.
+def refresh_frequency(frequency, snapshot_dir=SNAPSHOT_DIR, names=None):
+    # imported here so the dashboard only loads the fetch stack when refreshing
+    from data_loader import fetch_data_by_frequency, fetch_series
+    from data_transformer import transform_frame
+    from registry import series_codes
+    from snapshot import write_snapshot
+
+    with span("scheduled_refresh", frequency=frequency) as current:
+        version = current_version(snapshot_dir)
+        if version is None:
+            # first snapshot: needs every frequency
+            frames = fetch_data_by_frequency()
+            report = frames[0].attrs["refresh_report"]
+            transformed = [transform_frame(df, name) for name, df in zip(FREQUENCY_NAMES, frames)]
+            return write_snapshot(transformed, snapshot_dir), report
+        df = fetch_series(series_codes(frequency), names)
+        report = df.attrs["refresh_report"]
+        current.set(fetched=len(report["fetched"]), failed=len(report["failed"]))
+        if not report["fetched"]:
+            return None, report
+        previous = open_snapshot(version, snapshot_dir)[frequency].view()
+        frame = transform_frame(df, frequency, previous=previous)
+        return update_snapshot({frequency: frame}, snapshot_dir), report
+
+
+def refresh_key(frequency, names=None):
+    return f"refresh-{frequency}" if names is None else f"refresh-{frequency}-" + "-".join(sorted(names))
+
+
+def _lock_dir(snapshot_dir):
+    return os.path.join(snapshot_dir, "locks")
+
+
+# Single-flight refresh_frequency, shared by the scheduled refresher and the
+# dashboard: concurrent refreshes of one scope, in any process, run once.
+# Every scope of a frequency (the whole frequency or some of its series) runs
+# under the frequency's lock, so a series refresh never interleaves with, or
+# swaps older data over, a refresh of its frequency.
+# Returns ((version, report) or None, status) as single_flight.run.
+def refresh(frequency, names=None, snapshot_dir=SNAPSHOT_DIR, cooldown=REFRESH_COOLDOWN_SECONDS):
+    return single_flight.run(refresh_key(frequency, names), lambda: refresh_frequency(frequency, snapshot_dir, names),
+                             cooldown, _lock_dir(snapshot_dir), lock_key=refresh_key(frequency))
+
+
+class BackgroundRefresher:
+    def __init__(self, snapshot_dir=SNAPSHOT_DIR, poll_seconds=POLL_SECONDS):
+        self.snapshot_dir = snapshot_dir
+        self.poll_seconds = poll_seconds
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock_file = None
+        # per frequency: last check, last change, next due time and last error
+        self.status = {frequency: {"checked_at": None, "refreshed_at": None, "due_at": 0.0, "error": None}
+                       for frequency in FREQUENCY_NAMES}
+
+    # Schedules frequencies not checked by this refresher yet from the refresh
+    # times in the snapshot (which another process may have written)
+    def _sync(self):
+        version = current_version(self.snapshot_dir)
+        if version is None:
+            return
+        meta = snapshot_meta(version, self.snapshot_dir)
+        for frequency, status in self.status.items():
+            if status["checked_at"] is None:
+                refreshed_at = meta.get("refreshed_at", {}).get(frequency, meta["created_at"])
+                status.update(refreshed_at=refreshed_at, due_at=next_release(frequency, refreshed_at))
+
+    # Takes the refresher lock for this snapshot directory (held while the process lives)
+    def _acquire(self):
+        if self._lock_file is not None:
+            return True
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        lock_file = open(os.path.join(self.snapshot_dir, "refresher.lock"), "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    # Refreshes every frequency that is due; returns {frequency: new version or None}
+    def run_once(self, now=None, force=()):
+        now = time.time() if now is None else now
+        self._sync()
+        results = {}
+        for frequency, status in self.status.items():
+            if frequency not in force and now < status["due_at"]:
+                continue
+            try:
+                outcome, flight = refresh(frequency, snapshot_dir=self.snapshot_dir)
+            except Exception as e:
+                status.update(error=str(e), due_at=now + RETRY_AFTER_SECONDS)
+                increment("scheduled_refresh_total", frequency=frequency, result="error")
+                log_event("scheduled_refresh_failed", logging.WARNING, frequency=frequency, error=str(e))
+                continue
+            status.update(checked_at=now, error=None, due_at=next_release(frequency, now))
+            if outcome is None:
+                # refreshed by the dashboard or another process just now: check
+                # again once the cooldown ends (or later today) rather than
+                # skipping this release slot
+                if flight == "cooldown":
+                    last_run = single_flight.last_run(refresh_key(frequency), _lock_dir(self.snapshot_dir)) or now
+                    status["due_at"] = last_run + REFRESH_COOLDOWN_SECONDS
+                else:
+                    status["due_at"] = next_check(frequency, now)
+                increment("scheduled_refresh_total", frequency=frequency, result=flight)
+                results[frequency] = None
+                continue
+            version, report = outcome
+            if version is not None:
+                status["refreshed_at"] = now
+                # a first snapshot covers the frequencies still to come
+                self._sync()
+            elif not report["fetched"]:
+                status["due_at"] = next_check(frequency, now)
+            # series that failed keep their stored history; check again soon
+            if report["failed"]:
+                status.update(error=f"{len(report['failed'])} series failed", due_at=now + RETRY_AFTER_SECONDS)
+            increment("scheduled_refresh_total", frequency=frequency,
+                      result="updated" if version is not None else "unchanged")
+            results[frequency] = version
+        return results
+
+    # An unexpected error (e.g. an unreadable snapshot) is logged and the loop
+    # keeps polling, so the thread never dies silently
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self._acquire():
+                    self.run_once()
+            except Exception as e:
+                log_event("scheduled_refresh_loop_failed", logging.ERROR, error=str(e))
+            self._stop.wait(self.poll_seconds)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="macro-refresher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh the dashboard snapshot on the FRED release calendar.")
+    parser.add_argument("--config", help="TOML file with an api_key entry (default: FRED_API_KEY, then .streamlit/secrets.toml)")
+    parser.add_argument("--snapshot-dir", default=SNAPSHOT_DIR, help=f"snapshot directory (default: {SNAPSHOT_DIR})")
+    parser.add_argument("--once", nargs="*", choices=FREQUENCY_NAMES,
+                        help="refresh these frequencies (all when none are given) now and exit")
+    args = parser.parse_args(argv)
+
+    import data_loader
+    data_loader.configure(config_path=args.config)
+    refresher = BackgroundRefresher(args.snapshot_dir)
+    if not refresher._acquire():
+        print(f"Another refresher holds the lock for {args.snapshot_dir}")
+        return 1
+    if args.once is not None:
+        results = refresher.run_once(force=args.once or FREQUENCY_NAMES)
+        for frequency, status in refresher.status.items():
+            if frequency in results or status["error"]:
+                outcome = status["error"] or ("updated" if results[frequency] else "unchanged")
+                print(f"  {frequency:<10} {outcome}")
+        return 1 if any(status["error"] for status in refresher.status.values()) else 0
+    try:
+        while True:
+            refresher.run_once()
+            write_metrics()
+            time.sleep(refresher.poll_seconds)
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
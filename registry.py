@@ -0,0 +1,199 @@
+import pandas as pd
+
+# Single registry of raw FRED series and derived indicators. Raw indicators
+# carry a FRED code; derived ones declare their inputs and a formula that
+# receives the input series in order. Everything is evaluated lazily through
+# IndicatorGraph, so asking for one derived indicator only computes its inputs.
+
+QUARTERLY = "quarterly"
+MONTHLY = "monthly"
+WEEKLY = "weekly"
+FREQUENCIES = (QUARTERLY, MONTHLY, WEEKLY)
+# Typical days from the end of an observation's period to its first release,
+# for series that do not declare their own
+DEFAULT_RELEASE_LAG = {QUARTERLY: 60, MONTHLY: 30, WEEKLY: 7}
+
+
+class Indicator:
+    def __init__(self, name, frequency, units, code=None, inputs=(), formula=None, divisor=None, window=0,
+                 lag=None):
+        self.name = name
+        self.frequency = frequency
+        self.units = units
+        self.code = code
+        self.inputs = tuple(inputs)
+        self.formula = formula
+        self.divisor = divisor
+        # number of preceding rows the formula looks back (0 for pointwise formulas)
+        self.window = window
+        # days from the end of a period to its first release (None: frequency default)
+        self.lag = lag
+
+    @property
+    def is_derived(self):
+        return self.formula is not None
+
+
+def raw(name, code, frequency, units, divisor=None, lag=None):
+    return Indicator(name, frequency, units, code=code, divisor=divisor, lag=lag)
+
+
+def derived(name, frequency, units, inputs, formula, window=0):
+    return Indicator(name, frequency, units, inputs=inputs, formula=formula, window=window)
+
+
+def yoy_change(periods):
+    return lambda s: (s - s.shift(periods)) / s.shift(periods)
+
+
+INDICATORS = [
+    # Quarterly series
+    raw('GDP', 'GDP', QUARTERLY, 'USD Billions', lag=30),
+    raw('Real GDP', 'GDPC1', QUARTERLY, 'USD Billions', lag=30),
+    raw('Imports', 'IMPGS', QUARTERLY, 'USD Billions', lag=30),
+    raw('Exports', 'EXPGS', QUARTERLY, 'USD Billions', lag=30),
+    raw('Federal Debt Total Public Debt', 'GFDEBTN', QUARTERLY, 'USD Billions', divisor=1_000, lag=90),  # millions to billions
+    raw('Federal Debt Held by Federal Reserve Banks', 'FDHBFRBN', QUARTERLY, 'USD Billions', lag=90),
+    raw('Federal Debt Held by Private Investors', 'FDHBPIN', QUARTERLY, 'USD Billions', lag=90),
+    raw('Federal Debt Held by the Public', 'FYGFDPUN', QUARTERLY, 'USD Billions', divisor=1_000, lag=90),
+    raw('Federal Debt Held by Foreign and International Investors', 'FDHBFIN', QUARTERLY, 'USD Billions', lag=90),
+    raw('Federal Debt Held by Agencies and Trusts', 'FDHBATN', QUARTERLY, 'USD Billions', divisor=1_000, lag=90),
+    raw('Federal Debt: Total Public Debt as Percent of GDP', 'GFDEGDQ188S', QUARTERLY, 'Percent', lag=90),
+    raw('Delinquency Rate on Business Loans, All Commercial Banks', 'DRBLACBS', QUARTERLY, 'Percent'),
+    raw('Delinquency Rate on Credit Card Loans, All Commercial Banks', 'DRCCLACBS', QUARTERLY, 'Percent'),
+    raw('Delinquency Rate on Consumer Loans, All Commercial Banks', 'DRCLACBS', QUARTERLY, 'Percent'),
+    raw('Delinquency Rate on All Loans, All Commercial Banks', 'DRALACBN', QUARTERLY, 'Percent'),
+
+    # Monthly series
+    raw('Unemployment Rate', 'UNRATE', MONTHLY, 'Percent', lag=7),
+    raw('CPI', 'CPIAUCSL', MONTHLY, 'Index (1982–84=100)', lag=15),
+    raw('PCE', 'PCE', MONTHLY, 'Index (2012=100)'),
+    raw('Labor Force Participation Rate', 'CIVPART', MONTHLY, 'Percent', lag=7),
+    raw('Job Openings Total Nonfarm', 'JTSJOL', MONTHLY, 'Thousands', lag=40),
+    raw('Unemployment Level', 'UNEMPLOY', MONTHLY, 'Thousands', lag=7),
+    raw('Federal Funds Effective Rate', 'FEDFUNDS', MONTHLY, 'Percent', lag=3),
+    raw('M1', 'M1SL', MONTHLY, 'USD Billions'),
+    raw('M2', 'M2SL', MONTHLY, 'USD Billions'),
+    raw('Monthly Transition Rate of All U.S. Workers From Employment to Non-Employment Due to a Layoff', 'EMELASA', MONTHLY, 'Percent'),
+    raw('Monthly Transition Rate of Prime-Age U.S. Workers From Employment to Non-Employment Due to a Layoff', 'EMELPSA', MONTHLY, 'Percent'),
+    raw('Monthly Transition Rate of All U.S. Workers From Employment to Non-Employment Due to a Quit', 'EMEQASA', MONTHLY, 'Percent'),
+    raw('Monthly Transition Rate of Prime-Age U.S. Workers From Employment to Non-Employment Due to a Quit', 'EMEQPSA', MONTHLY, 'Percent'),
+    raw('Monthly Share of All U.S. Workers Who Leave the Labor Force After a Layoff', 'EMSHRNLA', MONTHLY, 'Percent'),
+    raw('Monthly Share of Prime-Age U.S. Workers Who Leave the Labor Force After a Layoff', 'EMSHRNLP', MONTHLY, 'Percent'),
+    raw('Monthly Share of All U.S. Workers Who Leave the Labor Force After a Quit', 'EMSHRNQA', MONTHLY, 'Percent'),
+    raw('Monthly Share of Prime-Age U.S. Workers Who Leave the Labor Force After a Quit', 'EMSHRNQP', MONTHLY, 'Percent'),
+    raw('University of Michigan: Consumer Sentiment', 'UMCSENT', MONTHLY, 'Index (1966 Q1=100)'),
+    raw('University of Michigan: Inflation Expectation', 'MICH', MONTHLY, 'Percent'),
+    raw('Economic Policy Uncertainty Index for United States', 'USEPUINDXM', MONTHLY, 'Index'),
+    raw('Average Hourly Earnings of All Employees, Total Private', 'CES0500000003', MONTHLY, 'Dollar per Hour', lag=7),
+    raw('Average Weekly Hours of All Employees, Total Private', 'AWHAETP', MONTHLY, 'Hours', lag=7),
+    raw('All Employees Total Nonfarm', 'PAYEMS', MONTHLY, 'Thousands', lag=7),
+
+    # Weekly series
+    raw('Initial Claims', 'ICSA', WEEKLY, 'Number of Claims', lag=5),
+    raw('Continued Claims (Insured Unemployment)', 'CCSA', WEEKLY, 'Number', lag=12),
+    raw('4-Week Moving Average of Initial Claims', 'IC4WSA', WEEKLY, 'Number', lag=5),
+    raw('4-Week Moving Average of Continued Claims (Insured Unemployment)', 'CC4WSA', WEEKLY, 'Number', lag=12),
+
+    # Derived quarterly indicators
+    derived('GDP deflator', QUARTERLY, 'Index', ['GDP', 'Real GDP'],
+            lambda gdp, real_gdp: (gdp / real_gdp) * 100),
+    derived('Real GDP Growth', QUARTERLY, 'Percent', ['Real GDP'],
+            lambda real_gdp: real_gdp.pct_change(periods=4, fill_method=None) * 100, window=4),
+    derived('Net Exports', QUARTERLY, 'USD Billions', ['Exports', 'Imports'],
+            lambda exports, imports: exports / imports),
+
+    # Derived monthly indicators
+    derived('CPI YoY Inflation', MONTHLY, 'Percent', ['CPI'], yoy_change(12), window=12),
+    derived('PCE YoY Inflation', MONTHLY, 'Percent', ['PCE'], yoy_change(12), window=12),
+    derived('Job Vacancy-to-Unemployment Ratio', MONTHLY, 'Ratio',
+            ['Job Openings Total Nonfarm', 'Unemployment Level'],
+            lambda openings, unemployed: openings / unemployed),
+]
+
+REGISTRY = {indicator.name: indicator for indicator in INDICATORS}
+
+
+# {name: FRED code} of the raw series of one frequency, in registry order
+def series_codes(frequency):
+    return {ind.name: ind.code for ind in INDICATORS if ind.frequency == frequency and not ind.is_derived}
+
+
+# Days from the end of a period to its first release; a derived indicator
+# waits for its slowest input. Unregistered series use the frequency default.
+def release_lag(name, frequency):
+    indicator = REGISTRY.get(name)
+    if indicator is None:
+        return DEFAULT_RELEASE_LAG[frequency]
+    if indicator.is_derived:
+        return max(release_lag(dep, indicator.frequency) for dep in indicator.inputs)
+    return DEFAULT_RELEASE_LAG[indicator.frequency] if indicator.lag is None else indicator.lag
+
+
+def derived_names(frequency):
+    return [ind.name for ind in INDICATORS if ind.frequency == frequency and ind.is_derived]
+
+
+# Raw series an indicator is computed from (itself for a raw series)
+def raw_inputs(name):
+    indicator = REGISTRY[name]
+    if not indicator.is_derived:
+        return [name]
+    return list(dict.fromkeys(raw for dep in indicator.inputs for raw in raw_inputs(dep)))
+
+
+# Total rows of history an indicator needs, following its inputs down to raw series
+def lookback(name):
+    indicator = REGISTRY.get(name)
+    if indicator is None or not indicator.is_derived:
+        return 0
+    return indicator.window + max((lookback(dep) for dep in indicator.inputs), default=0)
+
+
+# Lazy, memoized evaluation of the indicator DAG over raw frames
+# ({frequency: DataFrame of raw series}). A node is only computed the first
+# time it is requested, and only if all of its inputs are available.
+# apply_divisors=False is for frames whose raw columns are already scaled,
+# e.g. the raw part of a previously transformed frame.
+class IndicatorGraph:
+    def __init__(self, raw_frames, apply_divisors=True):
+        self.raw_frames = raw_frames
+        self.apply_divisors = apply_divisors
+        self._cache = {}
+
+    def available(self, name):
+        indicator = REGISTRY.get(name)
+        if indicator is not None and indicator.is_derived:
+            return all(self.available(dep) for dep in indicator.inputs)
+        return self._raw_frame(name, indicator) is not None
+
+    def get(self, name):
+        if name in self._cache:
+            return self._cache[name]
+        indicator = REGISTRY.get(name)
+        if indicator is not None and indicator.is_derived:
+            series = indicator.formula(*(self.get(dep) for dep in indicator.inputs))
+            series.name = name
+        else:
+            series = self._raw_frame(name, indicator)[name]
+            if self.apply_divisors and indicator is not None and indicator.divisor is not None:
+                series = series / indicator.divisor
+        self._cache[name] = series
+        return series
+
+    # Frame holding a raw column; unregistered columns are looked up in every frame
+    def _raw_frame(self, name, indicator):
+        if indicator is not None:
+            frame = self.raw_frames.get(indicator.frequency)
+            return frame if frame is not None and name in frame.columns else None
+        return next((df for df in self.raw_frames.values() if name in df.columns), None)
+
+    # Raw columns of a frequency (in their frame order) followed by every
+    # available derived indicator of that frequency
+    def frame(self, frequency, names=None):
+        raw_frame = self.raw_frames[frequency]
+        if names is None:
+            names = list(raw_frame.columns) + [n for n in derived_names(frequency) if self.available(n)]
+        df = pd.DataFrame({name: self.get(name) for name in names}, index=raw_frame.index)
+        df.attrs = dict(raw_frame.attrs)
+        return df
@@ -0,0 +1,151 @@
+import concurrent.futures
+import io
+import logging
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+import matplotlib
+from matplotlib.figure import Figure
+
+from instrumentation import cache_lookup, log_event, observe, span
+from utils import content_hash
+
+# Render service for the static matplotlib charts. Charts are drawn on
+# pyplot-free Figure objects (nothing is registered with pyplot, so nothing
+# leaks on a long-running server), rasterized once and cached as bytes keyed
+# by a hash of the input data. Rendering can run in a worker process so a long
+# rasterization neither holds the GIL of the Streamlit server nor blocks the
+# script run that asked for it: submit_chart hands back a future.
+
+CHART_STYLE = {'font.family': 'Times New Roman', 'font.size': 12}
+RENDER_CACHE_SIZE = 64
+_render_cache = OrderedDict()
+_render_cache_lock = threading.Lock()
+# {cache key: future} of the renders running in the worker process
+_rendering = {}
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def vacancy_unemployment_chart(ratio):
+    dataset = ratio.dropna().rename('vacancy_to_unemployment').rename_axis('Periods').reset_index()
+    dataset['Periods'] = pd.to_datetime(dataset['Periods'])
+    dataset['rolling_avg'] = dataset['vacancy_to_unemployment'].rolling(window=4, min_periods=1).mean()
+    fig = Figure(figsize=(12, 3.8))
+    ax = fig.subplots()
+    ax.plot(dataset['Periods'], dataset['vacancy_to_unemployment'], color='red', label='Vacancy to Unemployment Ratio', alpha=0.8)
+    ax.plot(dataset['Periods'], dataset['rolling_avg'], color='darkred', linestyle='--', label='1-Year Moving Average', linewidth=2)
+    ax.axvspan(pd.to_datetime('2020-03-01'), pd.to_datetime('2021-12-31'), color='gray', alpha=0.3, label='COVID-19 Period')
+    last_period, last_ratio, last_rolling_avg = dataset['Periods'].iloc[-1], dataset['vacancy_to_unemployment'].iloc[-1], dataset['rolling_avg'].iloc[-1]
+    ax.text(last_period, last_ratio, f'{last_ratio:.2f}', color='red', fontsize=10, ha='left', va='center')
+    ax.text(last_period, last_rolling_avg, f'{last_rolling_avg:.2f}', color='darkred', fontsize=10, ha='left', va='center')
+    max_ratio = dataset['vacancy_to_unemployment'].max()
+    max_ratio_period = dataset.loc[dataset['vacancy_to_unemployment'].idxmax(), 'Periods']
+    ax.text(max_ratio_period, max_ratio, f'{max_ratio:.2f}', color='red', fontsize=10, ha='left', va='bottom')
+    ax.scatter(max_ratio_period, max_ratio, color='red', s=50, label='Peak of Vacancy to Unemployment ratio')
+    ax.set_title("Jobseekers vs Job Vacancies", fontsize=11, fontweight='bold', pad=10)
+    ax.axhline(y=1, color='black', linestyle='--', linewidth=1)
+    mid_period = dataset['Periods'].iloc[len(dataset) // 2]
+    ax.annotate('▲ More jobs than unemployed', xy=(mid_period, 1), xytext=(mid_period, 1.05), fontsize=10, fontweight='bold', ha='center', color='black')
+    ax.annotate('▼ Fewer jobs than unemployed', xy=(mid_period, 1), xytext=(mid_period, 0.9), fontsize=10, fontweight='bold', ha='center', color='black')
+    ax.set_xticks(pd.date_range(start=dataset['Periods'].min(), end=dataset['Periods'].max(), freq='2YS'))
+    ax.tick_params(axis='x', which='both', direction='out', bottom=True)
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+    ax.legend(loc='upper left', fontsize=10, frameon=True, edgecolor='black')
+    ax.grid(False)
+    fig.tight_layout(pad=1.5)
+    return fig
+
+
+# Draw and rasterize in the calling process; returns the encoded image bytes
+def rasterize(chart_func, data, fmt="png", dpi=200):
+    with matplotlib.rc_context(CHART_STYLE):
+        fig = chart_func(data)
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format=fmt, dpi=dpi, bbox_inches="tight")
+    fig.clear()
+    return buffer.getvalue()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn, not fork: forking a threaded Streamlit server is unsafe
+            _executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+
+def _chart_key(chart_func, data, fmt):
+    frame = data.to_frame() if isinstance(data, pd.Series) else data
+    return (chart_func.__module__, chart_func.__name__, content_hash(frame), fmt)
+
+
+def _cached_image(key):
+    with _render_cache_lock:
+        image = _render_cache.get(key)
+        if image is not None:
+            _render_cache.move_to_end(key)
+    cache_lookup("render", image is not None)
+    return image
+
+
+def _cache_image(key, image):
+    with _render_cache_lock:
+        _render_cache[key] = image
+        while len(_render_cache) > RENDER_CACHE_SIZE:
+            _render_cache.popitem(last=False)
+
+
+# Cached image bytes for chart_func(data), drawn in the calling process
+def render_chart(chart_func, data, fmt="png"):
+    key = _chart_key(chart_func, data, fmt)
+    image = _cached_image(key)
+    if image is not None:
+        return image
+    with span("chart_render", chart=chart_func.__name__, fmt=fmt, in_worker=False):
+        image = rasterize(chart_func, data, fmt)
+    _cache_image(key, image)
+    return image
+
+
+# Future of the image bytes for chart_func(data), drawn in the worker process
+# so the caller does not wait on it; already resolved on a cache hit. Requests
+# for a chart that is still rendering share its future, and the image is
+# cached when it finishes. chart_func must be a module-level function so it
+# can be sent to the worker.
+def submit_chart(chart_func, data, fmt="png"):
+    key = _chart_key(chart_func, data, fmt)
+    image = _cached_image(key)
+    if image is not None:
+        future = concurrent.futures.Future()
+        future.set_result(image)
+        return future
+    with _render_cache_lock:
+        future = _rendering.get(key)
+        if future is not None:
+            return future
+        future = _rendering[key] = _get_executor().submit(rasterize, chart_func, data, fmt)
+    started = time.perf_counter()
+    labels = {"chart": chart_func.__name__, "fmt": fmt, "in_worker": True}
+
+    # cached before the future is dropped, so no request in between renders again
+    def finished(done):
+        duration = time.perf_counter() - started
+        observe("chart_render_duration_seconds", duration, **labels)
+        if done.exception() is None:
+            _cache_image(key, done.result())
+            log_event("chart_render", duration_ms=round(duration * 1000, 3), **labels)
+        else:
+            log_event("chart_render", logging.WARNING, duration_ms=round(duration * 1000, 3), **labels,
+                      result="error", error=str(done.exception()))
+        with _render_cache_lock:
+            _rendering.pop(key, None)
+
+    future.add_done_callback(finished)
+    return future
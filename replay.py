@@ -0,0 +1,159 @@
+import atexit
+import gzip
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+# Record/replay for the FRED transport, selected with environment variables:
+#
+#     FRED_MODE=record FRED_BUNDLE=bundles/fred.jsonl.gz python prefetch.py
+#     FRED_MODE=replay FRED_BUNDLE=bundles/fred.jsonl.gz streamlit run us_data.py
+#
+# Record mode passes requests through to FRED and captures every raw response
+# (status, body, elapsed time) into a gzip-compressed JSON-lines bundle,
+# saved when the engine closes or the process exits. The API key is never
+# stored. Replay mode serves the same requests from the bundle without
+# network access or a key, after an injected delay set by FRED_REPLAY_LATENCY:
+#
+#     recorded            the latency measured when recording (default)
+#     none                no delay
+#     <ms>                a fixed delay, e.g. 80
+#     lognormal:<ms>:<s>  lognormal around a median of <ms> with sigma <s>
+#
+# FRED_REPLAY_LATENCY_SCALE multiplies the delay (e.g. 3 to reproduce a slow
+# FRED). Delays are seeded per request (FRED_REPLAY_SEED), so a replay run
+# injects the same delays whatever the thread scheduling.
+
+BUNDLE_PATH = os.environ.get("FRED_BUNDLE", os.path.join("bundles", "fred.jsonl.gz"))
+REPLAY_LATENCY = os.environ.get("FRED_REPLAY_LATENCY", "recorded")
+REPLAY_LATENCY_SCALE = float(os.environ.get("FRED_REPLAY_LATENCY_SCALE", "1"))
+REPLAY_SEED = os.environ.get("FRED_REPLAY_SEED", "0")
+# request parameters that do not identify the response
+IGNORED_PARAMS = ("api_key", "file_type")
+
+
+def request_key(path, params):
+    kept = sorted((key, str(value)) for key, value in params.items() if key not in IGNORED_PARAMS)
+    return json.dumps([path, kept])
+
+
+def load_bundle(path):
+    records = {}
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            records[record["key"]] = record
+    return records
+
+
+def save_bundle(records, path):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        for record in records.values():
+            f.write(json.dumps(record) + "\n")
+    os.replace(tmp_path, path)
+
+
+# Wraps the live transport and captures every response. Recording into an
+# existing bundle adds to it; a later response to the same request replaces
+# the earlier one (so a retried 503 is stored as the final answer).
+class RecordingTransport:
+    def __init__(self, inner, path=BUNDLE_PATH):
+        self.inner = inner
+        self.path = path
+        self.records = load_bundle(path) if os.path.exists(path) else {}
+        self._lock = threading.Lock()
+        self._saved = True
+        atexit.register(self.save)
+
+    def get(self, path, params):
+        started = time.perf_counter()
+        status, content = self.inner.get(path, params)
+        key = request_key(path, params)
+        record = {
+            "key": key,
+            "path": path,
+            "params": {k: str(v) for k, v in params.items() if k not in IGNORED_PARAMS},
+            "status": status,
+            "body": content.decode("utf-8"),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
+        }
+        with self._lock:
+            self.records[key] = record
+            self._saved = False
+        return status, content
+
+    def save(self):
+        with self._lock:
+            if not self._saved:
+                save_bundle(self.records, self.path)
+                self._saved = True
+
+    def close(self):
+        self.save()
+        self.inner.close()
+
+
+class ReplayTransport:
+    def __init__(self, path=BUNDLE_PATH, latency=REPLAY_LATENCY, scale=REPLAY_LATENCY_SCALE, seed=REPLAY_SEED):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No replay bundle at {path}; record one with FRED_MODE=record")
+        self.records = load_bundle(path)
+        self.latency = latency
+        self.scale = scale
+        self.seed = seed
+
+    def delay(self, key, record):
+        if self.latency == "none":
+            return 0.0
+        if self.latency == "recorded":
+            return record.get("elapsed_ms", 0) / 1000 * self.scale
+        if self.latency.startswith("lognormal:"):
+            _, median_ms, sigma = self.latency.split(":")
+            rng = random.Random(hashlib.sha1(f"{self.seed}:{key}".encode()).hexdigest())
+            return float(median_ms) / 1000 * rng.lognormvariate(0, float(sigma)) * self.scale
+        return float(self.latency) / 1000 * self.scale
+
+    # Recorded response for a request. A delta fetch (observation_start) that
+    # was not recorded is answered from the recorded full history.
+    def _lookup(self, path, params):
+        key = request_key(path, params)
+        record = self.records.get(key)
+        if record is not None or path != "series/observations" or "observation_start" not in params:
+            return key, record
+        full = self.records.get(request_key(path, {k: v for k, v in params.items() if k != "observation_start"}))
+        if full is None or full["status"] != 200:
+            return key, None
+        payload = json.loads(full["body"])
+        start = str(params["observation_start"])
+        payload["observations"] = [obs for obs in payload["observations"] if obs["date"] >= start]
+        payload["count"] = len(payload["observations"])
+        return key, dict(full, body=json.dumps(payload))
+
+    def get(self, path, params):
+        key, record = self._lookup(path, params)
+        if record is None:
+            body = {"error_code": 404, "error_message": f"Request not in replay bundle: {key}"}
+            return 404, json.dumps(body).encode("utf-8")
+        time.sleep(self.delay(key, record))
+        return record["status"], record["body"].encode("utf-8")
+
+    def close(self):
+        pass
+
+
+# Transport for FRED_MODE: "record" wraps the live transport, "replay"
+# replaces it
+def transport_from_env(live_transport):
+    mode = os.environ.get("FRED_MODE", "live")
+    if mode == "record":
+        return RecordingTransport(live_transport)
+    if mode == "replay":
+        live_transport.close()
+        return ReplayTransport()
+    raise ValueError(f"Unknown FRED_MODE: {mode} (expected live, record or replay)")
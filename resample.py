@@ -0,0 +1,134 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import cache_lookup, span
+from registry import QUARTERLY, MONTHLY, WEEKLY
+
+# Mixed-frequency alignment: puts any set of series, whatever their native
+# frequency, on one target frequency. Works on the sorted (dates, values)
+# arrays of the CompactStores; each series is grouped by target period with
+# one vectorized pass (period keys, run boundaries, np.add.reduceat).
+#
+# Methods, per target period:
+#   mean  average of the observations in the period
+#   last  last observation in the period
+#   sum   sum of the observations in the period
+#   end   value as of the period's end: the latest observation on or before
+#         it, carried forward through later periods without observations
+#
+# Periods are labelled like the frames: quarter and month start dates, and
+# the Saturday ending the week for weekly data.
+
+METHODS = ("mean", "last", "sum", "end")
+ALIGN_CACHE_SIZE = 64
+_align_cache = OrderedDict()
+_align_cache_lock = threading.Lock()
+
+_SATURDAY = 5
+# 1970-01-01, day 0 of datetime64[D], was a Thursday
+_EPOCH_WEEKDAY = 3
+
+
+# Integer period key of each date: months since epoch (quarters are keyed by
+# the first month of the quarter) or days since epoch for week-ending dates
+def period_keys(dates, frequency):
+    if frequency == WEEKLY:
+        days = dates.astype("datetime64[D]").astype(np.int64)
+        return days + (_SATURDAY - (days + _EPOCH_WEEKDAY) % 7) % 7
+    months = dates.astype("datetime64[M]").astype(np.int64)
+    if frequency == QUARTERLY:
+        return months - months % 3
+    if frequency == MONTHLY:
+        return months
+    raise ValueError(f"Unknown frequency: {frequency}")
+
+
+def _period_dates(keys, frequency):
+    unit = "datetime64[D]" if frequency == WEEKLY else "datetime64[M]"
+    return keys.astype(unit).astype("datetime64[ns]")
+
+
+def _period_step(frequency):
+    return {QUARTERLY: 3, MONTHLY: 1, WEEKLY: 7}[frequency]
+
+
+# One series grouped by period: (unique period keys, aggregated values)
+def aggregate(dates, values, frequency, method="mean"):
+    if method not in METHODS:
+        raise ValueError(f"Unknown aggregation method: {method}")
+    keys = period_keys(dates, frequency)
+    if len(keys) == 0:
+        return keys, np.asarray(values, dtype="float64")
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    values = np.asarray(values, dtype="float64")
+    if method in ("last", "end"):
+        ends = np.r_[starts[1:], len(keys)] - 1
+        return keys[starts], values[ends]
+    sums = np.add.reduceat(values, starts)
+    if method == "sum":
+        return keys[starts], sums
+    return keys[starts], sums / np.diff(np.r_[starts, len(keys)])
+
+
+# Wide frame of the series in `series_arrays` ({name: (dates, values)}) on a
+# contiguous index of target periods spanning all of them
+def align_arrays(series_arrays, frequency, method="mean"):
+    grouped = {name: aggregate(dates, values, frequency, method) for name, (dates, values) in series_arrays.items()}
+    present = [keys for keys, _ in grouped.values() if len(keys)]
+    if not present:
+        return pd.DataFrame(index=pd.DatetimeIndex([]), columns=list(grouped), dtype="float64")
+    step = _period_step(frequency)
+    first, last = min(keys[0] for keys in present), max(keys[-1] for keys in present)
+    target = np.arange(first, last + 1, step)
+    data = {}
+    for name, (keys, values) in grouped.items():
+        column = np.full(len(target), np.nan)
+        if len(keys):
+            if method == "end":
+                position = np.searchsorted(keys, target, side="right") - 1
+                valid = position >= 0
+                column[valid] = values[position[valid]]
+            else:
+                column[(keys - first) // step] = values
+        data[name] = column
+    return pd.DataFrame(data, index=pd.DatetimeIndex(_period_dates(target, frequency)))
+
+
+# Native frequency of a series: the first store (or frame) that holds it
+def locate(stores, name):
+    for frequency, store in stores.items():
+        if name in store:
+            return frequency
+    return None
+
+
+# Memoized aligned frame of `names` from the per-frequency CompactStores,
+# keyed by data version, series set, target frequency and method. Cached
+# frames are shared between reruns and sessions, so callers must not mutate them.
+def align(stores, names, frequency, method="mean"):
+    names = tuple(names)
+    versions = tuple(store.attrs.get("data_version") for store in stores.values())
+    key = (versions, names, frequency, method)
+    with _align_cache_lock:
+        df = _align_cache.get(key)
+        if df is not None:
+            _align_cache.move_to_end(key)
+    cache_lookup("align", df is not None)
+    if df is not None:
+        return df
+    with span("align", frequency=frequency, method=method) as current:
+        current.set(series=len(names))
+        arrays = {}
+        for name in names:
+            source = locate(stores, name)
+            if source is not None:
+                arrays[name] = stores[source].arrays[name]
+        df = align_arrays(arrays, frequency, method)
+    with _align_cache_lock:
+        _align_cache[key] = df
+        while len(_align_cache) > ALIGN_CACHE_SIZE:
+            _align_cache.popitem(last=False)
+    return df
@@ -0,0 +1,180 @@
+import fcntl
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+import pandas as pd
+
+# Local columnar store: one Parquet file per FRED series plus a manifest.json
+# holding the last stored observation date of every series.
+#
+# Several processes share a store (dashboard workers, refresher.py,
+# prefetch.py, bulk_loader.py). Each one only writes the fields it changed:
+# a save takes an exclusive lock on manifest.lock, reloads the manifest from
+# disk and applies this process's pending changes on top. Reads pick up other
+# processes' saves when the manifest file changes.
+DEFAULT_STORE_DIR = os.environ.get("MACRO_STORE_DIR", "data_store")
+
+
+class SeriesStore:
+    def __init__(self, root=DEFAULT_STORE_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        self._batch_depth = 0
+        self._dirty = False
+        # {code: {field: value}} changed here and not saved yet
+        self._pending = {}
+        os.makedirs(self.root, exist_ok=True)
+        self.manifest_path = os.path.join(self.root, "manifest.json")
+        self._loaded_stamp = None
+        self.manifest = self._load_manifest()
+
+    def _manifest_stamp(self):
+        try:
+            stat = os.stat(self.manifest_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _load_manifest(self):
+        self._loaded_stamp = self._manifest_stamp()
+        if self._loaded_stamp is None:
+            return {}
+        with open(self.manifest_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    # On-disk manifest with this process's pending changes applied; the lock must be held
+    def _merged_manifest(self):
+        manifest = self._load_manifest()
+        for code, fields in self._pending.items():
+            manifest.setdefault(code, {}).update(fields)
+        return manifest
+
+    # Reload when another process saved the manifest since we last read it
+    def _refresh(self):
+        if self._manifest_stamp() != self._loaded_stamp:
+            with self._lock:
+                if self._manifest_stamp() != self._loaded_stamp:
+                    self.manifest = self._merged_manifest()
+
+    def _save_manifest(self):
+        with open(os.path.join(self.root, "manifest.lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            manifest = self._merged_manifest()
+            # write to a temp file and swap so a crash never leaves a half-written manifest
+            tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.manifest_path)
+            self._loaded_stamp = self._manifest_stamp()
+        self.manifest = manifest
+        self._pending = {}
+        self._dirty = False
+
+    # Called with the lock held after every manifest change; saving is
+    # deferred while a batch() is open
+    def _manifest_changed(self):
+        self._dirty = True
+        if self._batch_depth == 0:
+            self._save_manifest()
+
+    # Group many manifest updates (e.g. a bulk load of thousands of series)
+    # into periodic saves: inside the block the manifest is only written by
+    # flush() and when the outermost batch exits
+    @contextmanager
+    def batch(self):
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if self._batch_depth == 0 and self._dirty:
+                    self._save_manifest()
+
+    def flush(self):
+        with self._lock:
+            if self._dirty:
+                self._save_manifest()
+
+    def _path(self, code):
+        return os.path.join(self.root, f"{code}.parquet")
+
+    # Records changed fields of a series; the lock must be held
+    def _set_fields(self, code, fields):
+        self.manifest.setdefault(code, {}).update(fields)
+        self._pending.setdefault(code, {}).update(fields)
+        self._manifest_changed()
+
+    def last_date(self, code):
+        self._refresh()
+        entry = self.manifest.get(code)
+        if entry is None or not entry.get("last_date") or not os.path.exists(self._path(code)):
+            return None
+        return pd.Timestamp(entry["last_date"])
+
+    def get_meta(self, code, key):
+        self._refresh()
+        return self.manifest.get(code, {}).get(key)
+
+    # (code, manifest entry) pairs, including other processes' saves
+    def items(self):
+        self._refresh()
+        return list(self.manifest.items())
+
+    def update_meta(self, code, **fields):
+        with self._lock:
+            self._set_fields(code, fields)
+
+    def read(self, code):
+        self._refresh()
+        path = self._path(code)
+        if code not in self.manifest or not os.path.exists(path):
+            return None
+        series = pd.read_parquet(path)["value"]
+        series.index = pd.to_datetime(series.index)
+        series.index.name = None
+        series.name = None
+        return series
+
+    def write(self, code, series):
+        series = series.sort_index()
+        series.index = pd.to_datetime(series.index)
+        frame = series.astype("float64").to_frame("value")
+        tmp_path = f"{self._path(code)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        frame.to_parquet(tmp_path)
+        os.replace(tmp_path, self._path(code))
+        with self._lock:
+            self._set_fields(code, {
+                "last_date": series.index[-1].strftime("%Y-%m-%d") if len(series) else None,
+                "observations": int(len(series)),
+            })
+        return series
+
+    # Replace the stored observations from `start` on with `new_series`, the
+    # result of a delta fetch that re-reads a revision window. An empty fetch
+    # leaves the stored copy alone.
+    def replace_from(self, code, start, new_series):
+        stored = self.read(code)
+        if stored is None:
+            return self.write(code, new_series)
+        if new_series is None or new_series.empty:
+            return stored
+        new_series = new_series.copy()
+        new_series.index = pd.to_datetime(new_series.index)
+        return self.write(code, pd.concat([stored[stored.index < pd.Timestamp(start)], new_series]))
+
+    # Append new observations after the last stored date. Overlapping dates
+    # take the newly fetched value.
+    def append(self, code, new_series):
+        stored = self.read(code)
+        if stored is None:
+            return self.write(code, new_series)
+        if new_series is None or new_series.empty:
+            return stored
+        new_series = new_series.copy()
+        new_series.index = pd.to_datetime(new_series.index)
+        combined = pd.concat([stored[~stored.index.isin(new_series.index)], new_series])
+        return self.write(code, combined)
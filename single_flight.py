@@ -0,0 +1,103 @@
+import fcntl
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from instrumentation import increment
+from series_store import DEFAULT_STORE_DIR
+
+# Single-flight execution: concurrent calls for the same key share one run.
+# Within a process, the first caller runs the function and later callers wait
+# for it and get its result. Across processes, the runner holds an exclusive
+# lock file for the key, so a second process waits for the first to finish
+# and then skips its own run. A finished run leaves a stamp file, and a call
+# within `cooldown` seconds of it does not run again. Keys that touch the
+# same data can pass a common `lock_key`: their runs are then serialized
+# under one lock file, while results are still shared per key.
+#
+# run() returns (result, status):
+#   ran       this call ran the function
+#   joined    another caller ran it meanwhile; result is theirs (None when
+#             it ran in another process)
+#   cooldown  it finished less than `cooldown` seconds ago; result is None
+
+LOCK_DIR = os.environ.get("MACRO_LOCK_DIR", os.path.join(DEFAULT_STORE_DIR, "locks"))
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def _key_path(lock_dir, key, suffix):
+    return os.path.join(lock_dir, re.sub(r"[^A-Za-z0-9_.-]", "_", key) + suffix)
+
+
+# Exclusive cross-process lock on `path`, held for the with block
+@contextmanager
+def file_lock(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+# Time the last run of `key` finished (any process), or None
+def last_run(key, lock_dir=LOCK_DIR):
+    try:
+        return os.path.getmtime(_key_path(lock_dir, key, ".done"))
+    except OSError:
+        return None
+
+
+def run(key, func, cooldown=0, lock_dir=LOCK_DIR, lock_key=None):
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+    if not leader:
+        flight.done.wait()
+        increment("single_flight_total", key=key, status="joined")
+        if flight.error is not None:
+            raise flight.error
+        return flight.result, "joined"
+
+    try:
+        result, status = _run_locked(key, func, cooldown, lock_dir, lock_key or key)
+        flight.result = result
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        with _flights_lock:
+            del _flights[key]
+        flight.done.set()
+    increment("single_flight_total", key=key, status=status)
+    return result, status
+
+
+def _run_locked(key, func, cooldown, lock_dir, lock_key):
+    requested_at = time.time()
+    with file_lock(_key_path(lock_dir, lock_key, ".lock")):
+        finished_at = last_run(key, lock_dir)
+        if finished_at is not None and finished_at >= requested_at:
+            return None, "joined"
+        if finished_at is not None and requested_at - finished_at < cooldown:
+            return None, "cooldown"
+        result = func()
+        stamp = _key_path(lock_dir, key, ".done")
+        with open(stamp, "a"):
+            pass
+        os.utime(stamp)
+        return result, "ran"
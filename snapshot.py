@@ -0,0 +1,145 @@
+import json
+import os
+import shutil
+import time
+
+import pyarrow as pa
+
+from compact_store import CompactStore
+from series_store import DEFAULT_STORE_DIR
+from single_flight import file_lock
+from utils import content_hash
+
+# Shared on-disk snapshot of the transformed quarterly, monthly and weekly
+# data, written by the prefetch CLI or the dashboard after a fetch.
+#
+# Each snapshot is an immutable version directory holding one Arrow IPC file
+# per frequency (the CompactStore layout) plus meta.json. The CURRENT file
+# names the live version and is swapped atomically, so a refresh in any
+# process becomes visible to all of them. Readers memory-map the Arrow files
+# and use the arrays in place: the data lives once in the host's page cache
+# rather than once per worker process.
+SNAPSHOT_DIR = os.environ.get("MACRO_SNAPSHOT_DIR", os.path.join(DEFAULT_STORE_DIR, "snapshot"))
+FREQUENCY_NAMES = ("quarterly", "monthly", "weekly")
+KEEP_VERSIONS = 3
+
+
+def _versions_dir(snapshot_dir):
+    return os.path.join(snapshot_dir, "versions")
+
+
+def _pointer_path(snapshot_dir):
+    return os.path.join(snapshot_dir, "CURRENT")
+
+
+# Writes a new version of all frequencies and points CURRENT at it; returns the version id
+def write_snapshot(frames, snapshot_dir=SNAPSHOT_DIR):
+    return update_snapshot(dict(zip(FREQUENCY_NAMES, frames)), snapshot_dir)
+
+
+# Writes a new version in which the frequencies in `frames` ({name: frame})
+# are replaced and the others are carried over (hard-linked) from the current
+# version, so each frequency can be refreshed on its own. meta.json records
+# when each frequency was last refreshed.
+def update_snapshot(frames, snapshot_dir=SNAPSHOT_DIR):
+    # writers of different frequencies must not carry over each other's old frames
+    os.makedirs(snapshot_dir, exist_ok=True)
+    with file_lock(os.path.join(snapshot_dir, "write.lock")):
+        return _update_snapshot(frames, snapshot_dir)
+
+
+def _update_snapshot(frames, snapshot_dir):
+    current = current_version(snapshot_dir)
+    if current is None and set(frames) != set(FREQUENCY_NAMES):
+        raise ValueError("The first snapshot needs every frequency")
+    previous = snapshot_meta(current, snapshot_dir) if current is not None else {}
+    version = str(time.time_ns())
+    version_dir = os.path.join(_versions_dir(snapshot_dir), version)
+    tmp_dir = version_dir + ".tmp"
+    os.makedirs(tmp_dir)
+    now = time.time()
+    meta = {"created_at": now, "version": version, "refreshed_at": {}}
+    for name in FREQUENCY_NAMES:
+        path = os.path.join(tmp_dir, f"{name}.arrow")
+        if name not in frames:
+            _link(os.path.join(_versions_dir(snapshot_dir), current, f"{name}.arrow"), path)
+            meta["refreshed_at"][name] = previous.get("refreshed_at", {}).get(name, previous["created_at"])
+            continue
+        df = frames[name]
+        # version key for caches of anything derived from this frame (e.g. exports)
+        df.attrs["data_version"] = content_hash(df)
+        batch = CompactStore.from_frame(df).to_record_batch()
+        with pa.OSFile(path, "wb") as sink:
+            with pa.ipc.new_file(sink, batch.schema) as writer:
+                writer.write_batch(batch)
+        meta["refreshed_at"][name] = now
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp_dir, version_dir)
+
+    pointer_tmp = _pointer_path(snapshot_dir) + f".{os.getpid()}.tmp"
+    with open(pointer_tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(pointer_tmp, _pointer_path(snapshot_dir))
+    _prune(snapshot_dir)
+    return version
+
+
+def _link(source, target):
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+# Drop old versions; processes still mapping them keep their pages until they
+# switch to the new version
+def _prune(snapshot_dir):
+    versions = sorted(
+        (v for v in os.listdir(_versions_dir(snapshot_dir)) if not v.endswith(".tmp")), key=int)
+    for version in versions[:-KEEP_VERSIONS]:
+        shutil.rmtree(os.path.join(_versions_dir(snapshot_dir), version), ignore_errors=True)
+
+
+def snapshot_meta(version, snapshot_dir=SNAPSHOT_DIR):
+    with open(os.path.join(_versions_dir(snapshot_dir), version, "meta.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+# Live version id, or None if there is no snapshot or it is older than max_age seconds
+def current_version(snapshot_dir=SNAPSHOT_DIR, max_age=None):
+    try:
+        with open(_pointer_path(snapshot_dir), encoding="utf-8") as f:
+            version = f.read().strip()
+        created_at = snapshot_meta(version, snapshot_dir)["created_at"]
+    except (OSError, ValueError, KeyError):
+        return None
+    if max_age is not None and time.time() - created_at > max_age:
+        return None
+    return version
+
+
+def snapshot_age(snapshot_dir=SNAPSHOT_DIR):
+    version = current_version(snapshot_dir)
+    if version is None:
+        return None
+    return time.time() - snapshot_meta(version, snapshot_dir)["created_at"]
+
+
+# {frequency: CompactStore} backed by memory-mapped Arrow files (zero-copy)
+def open_snapshot(version, snapshot_dir=SNAPSHOT_DIR):
+    stores = {}
+    for name in FREQUENCY_NAMES:
+        source = pa.memory_map(os.path.join(_versions_dir(snapshot_dir), version, f"{name}.arrow"))
+        stores[name] = CompactStore.from_record_batch(pa.ipc.open_file(source).get_batch(0))
+    return stores
+
+
+# (df_quarterly, df_monthly, df_weekly), or None if there is no snapshot or it
+# is older than max_age seconds
+def read_snapshot(snapshot_dir=SNAPSHOT_DIR, max_age=None):
+    version = current_version(snapshot_dir, max_age)
+    if version is None:
+        return None
+    stores = open_snapshot(version, snapshot_dir)
+    return tuple(stores[name].view() for name in FREQUENCY_NAMES)
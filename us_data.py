@@ -1,26 +1,35 @@
+import os
+import time
+
 import streamlit as st
 import plotly.graph_objects as go
-import plotly.express as px
 import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib as mpl
-import textwrap
 
-from data_loader import fetch_data_by_frequency
+from snapshot import FREQUENCY_NAMES, SNAPSHOT_DIR, current_version, open_snapshot, snapshot_meta, write_snapshot
+import single_flight
+from refresher import BackgroundRefresher, refresh
+from analytics import analyze, basis_frame, regimes
+from compact_store import memory_report
+from latest import latest_table
+from exports import EXPORT_FORMATS, cached_export, export_bytes, export_file_name
 from data_transformer import (
     transform_quarterly_data,
     transform_monthly_data,
     transform_weekly_data,
 )
 from charts import (
+    OVERLAY_NORMALIZATIONS,
+    downsample,
+    plot_overlay_chart,
     plot_quarterly_line_chart,
     plot_monthly_line_chart,
     plot_weekly_line_chart,
 )
+from instrumentation import span, write_metrics
+from registry import REGISTRY, raw_inputs
+from resample import METHODS, align, locate
 from utils import get_yaxis_label
 
-mpl.rcParams.update({'font.family': 'Times New Roman', 'font.size': 12})
-
 st.set_page_config(
     page_title="US Economic Dashboard",
     page_icon=":bar_chart:",
@@ -28,94 +37,174 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-@st.cache_data(ttl=86400)
-def load_data():
-    with st.spinner("Loading economic data from FRED..."):
-        df_quarterly, df_monthly, df_weekly = fetch_data_by_frequency()
+DATA_TTL = 86400
+# Set to 0 when refresher.py runs as its own service (or prefetch.py from cron)
+BACKGROUND_REFRESH = os.environ.get("MACRO_BACKGROUND_REFRESH", "1") != "0"
+
+# Fetch from FRED, transform, and refresh the shared snapshot
+def fetch_and_transform():
+    # imported here so a warm start from the snapshot never loads the fetch stack
+    from data_loader import fetch_data_by_frequency
 
-    return (
+    df_quarterly, df_monthly, df_weekly = fetch_data_by_frequency()
+
+    frames = (
         transform_quarterly_data(df_quarterly),
         transform_monthly_data(df_monthly),
         transform_weekly_data(df_weekly),
     )
+    write_snapshot(frames)
+    return frames
+
+# One CompactStore per frequency for a snapshot version, memory-mapped from the
+# shared snapshot so every worker process on the host uses the same pages.
+# cache_resource hands all sessions the same objects instead of a copy per hit.
+@st.cache_resource(ttl=DATA_TTL, max_entries=2)
+def load_data(version):
+    return open_snapshot(version)
+
+# One release-calendar refresher per server process; it only does work in
+# the process holding the refresher lock
+@st.cache_resource
+def start_refresher():
+    return BackgroundRefresher().start()
 
-def print_latest_dates(df, label):
-    st.write(f"**Latest dates in {label} data:**")
-    for col in df.columns:
-        latest_date = df[col].dropna().index.max()
-        st.write(f"{col}: {latest_date}")
+# Stores of the live snapshot version. Checking the CURRENT pointer is a tiny
+# file read, so a refresh done by any process is picked up on the next rerun.
+# Stale-while-revalidate: whatever snapshot exists is served at once and the
+# background refresher replaces it; FRED is only fetched on the request path
+# on a first start with no snapshot at all, once for all concurrent sessions.
+def get_version():
+    version = current_version()
+    if version is None:
+        with st.spinner("Loading economic data from FRED..."):
+            single_flight.run("initial-load", fetch_and_transform, lock_dir=os.path.join(SNAPSHOT_DIR, "locks"))
+        version = current_version()
+    return version
 
-def show_metric_with_change(df, column_name, label):
-    data = df[[column_name]].dropna().sort_index()
-    if len(data) < 2:
+# Last/previous values, changes and staleness of every series, computed once
+# per snapshot version from the last two entries of each compact series
+@st.cache_resource(ttl=DATA_TTL, max_entries=2)
+def load_latest(version):
+    return latest_table(load_data(version))
+
+def format_age(seconds):
+    if seconds < 3600:
+        return f"{seconds / 60:.0f} min"
+    if seconds < 86400:
+        return f"{seconds / 3600:.0f} h"
+    return f"{seconds / 86400:.0f} d"
+
+def show_metric_with_change(column_name, label):
+    if column_name not in latest.index:
+        return
+    row = latest.loc[column_name]
+    if row["observations"] < 2:
         return
-    current, previous = data.iloc[-1][column_name], data.iloc[-2][column_name]
     inflation_keywords = ["inflation", "cpi", "pce", "deflator"]
     if any(key in column_name.lower() for key in inflation_keywords):
-        delta_value = current - previous
-        main_value = f"{delta_value:+,.2f}"
-        delta_pct = ((current - previous) / previous) * 100 if previous != 0 else 0
-        delta_text = f"{delta_pct:+.2f}%"
+        main_value = f"{row['change']:+,.2f}"
+        delta_text = f"{row['pct_change']:+.2f}%"
     else:
-        delta_pct = ((current - previous) / previous) * 100 if previous != 0 else 0
-        main_value = f"{delta_pct:+.2f}%"
-        delta_value = current - previous
-        delta_text = f"{delta_value:+,.2f}"
-    st.metric(label=label, value=main_value, delta=delta_text, delta_color="normal")
-
-def get_data_from_session():
-    if "df_quarterly" not in st.session_state:
-        df_quarterly, df_monthly, df_weekly = load_data()
-        st.session_state.df_quarterly = df_quarterly
-        st.session_state.df_monthly = df_monthly
-        st.session_state.df_weekly = df_weekly
-    return (
-        st.session_state.df_quarterly,
-        st.session_state.df_monthly,
-        st.session_state.df_weekly,
-    )
+        main_value = f"{row['pct_change']:+.2f}%"
+        delta_text = f"{row['change']:+,.2f}"
+    as_of = f"Last observation {row['last_date']:%Y-%m-%d}, {row['staleness_days']:.0f} days ago"
+    if row["stale"]:
+        as_of += " (stale)"
+    st.metric(label=label, value=main_value, delta=delta_text, delta_color="normal", help=as_of)
+
+# Placeholder for a chart still drawing in the render worker. The fragment
+# polls the future instead of holding up the script run; once the image is
+# cached it reruns the page, which then shows the image without polling.
+@st.fragment(run_every=0.5)
+def render_pending_chart(future):
+    if not future.done():
+        st.caption("Rendering chart...")
+    elif future.exception() is not None:
+        st.error(f"Could not render the chart: {future.exception()}")
+    else:
+        st.rerun()
+
+CHART_FUNCS = {
+    "quarterly": plot_quarterly_line_chart,
+    "monthly": plot_monthly_line_chart,
+    "weekly": plot_weekly_line_chart,
+}
+
+REFRESH_SCOPES = ["All data", "Quarterly", "Monthly", "Weekly"]
 
-def handle_refresh():
-    load_data.clear()
-    df_quarterly, df_monthly, df_weekly = load_data()
-    print_latest_dates(df_quarterly, "Quarterly")
-    print_latest_dates(df_monthly, "Monthly")
-    print_latest_dates(df_weekly, "Weekly")
-    st.session_state.df_quarterly = df_quarterly
-    st.session_state.df_monthly = df_monthly
-    st.session_state.df_weekly = df_weekly
+# Refresh one frequency, one indicator (a derived one refreshes its raw
+# inputs) or everything. Refreshes are single-flight per scope across sessions
+# and processes, so simultaneous clicks share one fetch, and a scope refreshed
+# within the cooldown is not fetched again.
+def handle_refresh(scope):
+    if scope in REFRESH_SCOPES:
+        targets = [(frequency, None) for frequency in FREQUENCY_NAMES if scope in ("All data", frequency.title())]
+    else:
+        by_frequency = {}
+        for name in raw_inputs(scope):
+            by_frequency.setdefault(REGISTRY[name].frequency, []).append(name)
+        targets = list(by_frequency.items())
+    report = {"fetched": [], "skipped": [], "failed": {}, "shared": []}
+    with st.spinner(f"Refreshing {scope} from FRED..."):
+        for frequency, names in targets:
+            outcome, status = refresh(frequency, names)
+            if outcome is None:
+                report["shared"].append(frequency)
+                continue
+            part = outcome[1]
+            report["fetched"] += part["fetched"]
+            report["skipped"] += part["skipped"]
+            report["failed"].update(part["failed"])
+    st.session_state.refresh_report = report
     st.rerun()
 
-if st.button("🔄 Refresh All Data"):
-    handle_refresh()
+data_version = get_version()
+if BACKGROUND_REFRESH:
+    start_refresher()
+stores = load_data(data_version)
+latest = load_latest(data_version)
+
+refresh_col, button_col = st.columns([3, 1])
+refresh_options = REFRESH_SCOPES + sorted(name for name in latest.index if name in REGISTRY)
+refresh_scope = refresh_col.selectbox("Refresh", refresh_options, key="refresh_scope",
+                                      label_visibility="collapsed")
+if button_col.button("🔄 Refresh"):
+    handle_refresh(refresh_scope)
 
-df_quarterly, df_monthly, df_weekly = get_data_from_session()
+failed_series = {name: error for store in stores.values() for name, error in store.attrs.get("failed_series", {}).items()}
+if failed_series:
+    st.warning(f"Could not refresh from FRED, showing stored data where available: {list(failed_series)}")
 
-tabs = st.tabs([
-    "Labor Market", "Monetary Metrics", "Fiscal Metrics",
-    "Debtonomics", "Workforce Flows", "Custom Charts"
-])
+refresh_report = st.session_state.get("refresh_report")
+if refresh_report:
+    st.caption(
+        f"Last refresh: {len(refresh_report['fetched'])} series fetched, "
+        f"{len(refresh_report['skipped'])} unchanged and skipped, {len(refresh_report['failed'])} failed."
+        + (f" {', '.join(refresh_report['shared']).capitalize()} was refreshed moments ago and not fetched again."
+           if refresh_report["shared"] else "")
+    )
 
+# Each dashboard section is a render function. Only the selected section runs
+# on a script execution (st.tabs would run all of them), and Custom Charts is a
+# fragment, so its widgets rerun only that fragment. Sections get the
+# per-frequency CompactStores and build views of just the columns they plot.
 # 1. Labor Market
-with tabs[0]:
+def render_labor_market(stores):
     st.subheader("Labor Market Trends")
     labor_vars = [
         "Unemployment Rate", "Labor Force Participation Rate",
         "Initial Claims", "Unemployment Level", "Job Openings Total Nonfarm"
     ]
     for var in labor_vars:
-        source_df, chart_func = None, None
-        if df_monthly is not None and var in df_monthly.columns:
-            source_df, chart_func = df_monthly, plot_monthly_line_chart
-        elif df_weekly is not None and var in df_weekly.columns:
-            source_df, chart_func = df_weekly, plot_weekly_line_chart
-        if source_df is not None:
-            show_metric_with_change(source_df, var, var)
-            fig = chart_func(source_df, [var], title=var, yaxis_title=get_yaxis_label(var))
+        frequency = locate(stores, var)
+        if frequency is not None:
+            show_metric_with_change(var, var)
+            fig = CHART_FUNCS[frequency](stores[frequency].view([var]), [var], title=var, yaxis_title=get_yaxis_label(var))
             st.plotly_chart(fig, use_container_width=True)
 
 # 2. Monetary Metrics
-with tabs[1]:
+def render_monetary_metrics(stores):
     st.subheader("Monetary Indicators")
     monetary_vars = [
         "CPI YoY Inflation", "PCE YoY Inflation", "GDP Deflator",
@@ -123,27 +212,26 @@ with tabs[1]:
         "Federal Funds Effective Rate"
     ]
     for var in monetary_vars:
-        source_df = df_monthly if var in df_monthly.columns else df_quarterly
-        chart_func = plot_monthly_line_chart if source_df is df_monthly else plot_quarterly_line_chart
-        if var in source_df.columns:
-            show_metric_with_change(source_df, var, var)
-            fig = chart_func(source_df, [var], title=var, yaxis_title=get_yaxis_label(var))
+        frequency = locate(stores, var)
+        if frequency is not None:
+            show_metric_with_change(var, var)
+            fig = CHART_FUNCS[frequency](stores[frequency].view([var]), [var], title=var, yaxis_title=get_yaxis_label(var))
             st.plotly_chart(fig, use_container_width=True)
 
 # 3. Fiscal Metrics
-with tabs[2]:
+def render_fiscal_metrics(stores):
     st.subheader("Fiscal Indicators")
     fiscal_vars = [
         "GDP", "Real GDP", "GDP Growth", "Exports", "Imports", "Net Exports"
     ]
     for var in fiscal_vars:
-        if var in df_quarterly.columns:
-            show_metric_with_change(df_quarterly, var, var)
-            fig = plot_quarterly_line_chart(df_quarterly, [var], title=var, yaxis_title=get_yaxis_label(var))
+        if var in stores["quarterly"]:
+            show_metric_with_change(var, var)
+            fig = plot_quarterly_line_chart(stores["quarterly"].view([var]), [var], title=var, yaxis_title=get_yaxis_label(var))
             st.plotly_chart(fig, use_container_width=True)
 
 # 4. Debtonomics
-with tabs[3]:
+def render_debtonomics(stores):
     st.subheader("Federal Debt Breakdown")
     debt_vars = [
         "Federal Debt Total Public Debt",
@@ -154,14 +242,14 @@ with tabs[3]:
         "Federal Debt: Total Public Debt as Percent of GDP"
     ]
     for var in debt_vars:
-        if var in df_quarterly.columns:
-            show_metric_with_change(df_quarterly, var, var)
-            fig = plot_quarterly_line_chart(df_quarterly, [var], title=var, yaxis_title=get_yaxis_label(var))
+        if var in stores["quarterly"]:
+            show_metric_with_change(var, var)
+            fig = plot_quarterly_line_chart(stores["quarterly"].view([var]), [var], title=var, yaxis_title=get_yaxis_label(var))
             st.plotly_chart(fig, use_container_width=True)
     # Stacked Area Chart
     exclude_col = "Federal Debt: Total Public Debt as Percent of GDP"
-    debt_cols = [col for col in df_quarterly.columns if col.startswith("Federal Debt") and col != exclude_col]
-    df_debt = df_quarterly[debt_cols].dropna()
+    debt_cols = [col for col in stores["quarterly"].columns if col.startswith("Federal Debt") and col != exclude_col]
+    df_debt = stores["quarterly"].view(debt_cols).dropna()
     fig = go.Figure()
     for col in df_debt.columns:
         fig.add_trace(go.Scatter(
@@ -175,11 +263,18 @@ with tabs[3]:
     st.plotly_chart(fig, use_container_width=True, key="debt_stack_chart")
 
 # 5. Workforce Flows
-with tabs[4]:
+def render_workforce_flows(stores):
+    # plotly.express and matplotlib are only needed by this section
+    import textwrap
+    import plotly.express as px
+    from render_service import submit_chart, vacancy_unemployment_chart
+
+    monthly = stores["monthly"]
     # Beveridge Curve
-    if df_monthly is not None and 'Job Openings Total Nonfarm' in df_monthly.columns and 'Unemployment Rate' in df_monthly.columns:
-        x, y = df_monthly['Unemployment Rate'], df_monthly['Job Openings Total Nonfarm']
-        years = df_monthly.index.year.astype(str)
+    if 'Job Openings Total Nonfarm' in monthly and 'Unemployment Rate' in monthly:
+        df_beveridge = monthly.view(['Unemployment Rate', 'Job Openings Total Nonfarm'])
+        x, y = df_beveridge['Unemployment Rate'], df_beveridge['Job Openings Total Nonfarm']
+        years = df_beveridge.index.year.astype(str)
         fig_beveridge = px.scatter(
             x=x, y=y, color=years,
             labels={"x": "Unemployment Rate (%)", "y": "Job Openings (Thousands)"},
@@ -193,35 +288,12 @@ with tabs[4]:
         st.plotly_chart(fig_beveridge, use_container_width=True)
 
     # Vacancy-to-Unemployment Ratio Matplotlib
-    if df_monthly is not None and 'Job Vacancy-to-Unemployment Ratio' in df_monthly.columns:
-        dataset = df_monthly[['Job Vacancy-to-Unemployment Ratio']].dropna().reset_index()
-        dataset.rename(columns={'index': 'Periods', 'Job Vacancy-to-Unemployment Ratio': 'vacancy_to_unemployment'}, inplace=True)
-        dataset['Periods'] = pd.to_datetime(dataset['Periods'])
-        dataset['rolling_avg'] = dataset['vacancy_to_unemployment'].rolling(window=4, min_periods=1).mean()
-        fig, ax = plt.subplots(figsize=(12, 3.8))
-        ax.plot(dataset['Periods'], dataset['vacancy_to_unemployment'], color='red', label='Vacancy to Unemployment Ratio', alpha=0.8)
-        ax.plot(dataset['Periods'], dataset['rolling_avg'], color='darkred', linestyle='--', label='1-Year Moving Average', linewidth=2)
-        ax.axvspan(pd.to_datetime('2020-03-01'), pd.to_datetime('2021-12-31'), color='gray', alpha=0.3, label='COVID-19 Period')
-        last_period, last_ratio, last_rolling_avg = dataset['Periods'].iloc[-1], dataset['vacancy_to_unemployment'].iloc[-1], dataset['rolling_avg'].iloc[-1]
-        ax.text(last_period, last_ratio, f'{last_ratio:.2f}', color='red', fontsize=10, ha='left', va='center')
-        ax.text(last_period, last_rolling_avg, f'{last_rolling_avg:.2f}', color='darkred', fontsize=10, ha='left', va='center')
-        max_ratio = dataset['vacancy_to_unemployment'].max()
-        max_ratio_period = dataset.loc[dataset['vacancy_to_unemployment'].idxmax(), 'Periods']
-        ax.text(max_ratio_period, max_ratio, f'{max_ratio:.2f}', color='red', fontsize=10, ha='left', va='bottom')
-        ax.scatter(max_ratio_period, max_ratio, color='red', s=50, label='Peak of Vacancy to Unemployment ratio')
-        ax.set_title("Jobseekers vs Job Vacancies", fontsize=11, fontweight='bold', pad=10)
-        ax.axhline(y=1, color='black', linestyle='--', linewidth=1)
-        mid_period = dataset['Periods'].iloc[len(dataset) // 2]
-        ax.annotate('▲ More jobs than unemployed', xy=(mid_period, 1), xytext=(mid_period, 1.05), fontsize=10, fontweight='bold', ha='center', color='black')
-        ax.annotate('▼ Fewer jobs than unemployed', xy=(mid_period, 1), xytext=(mid_period, 0.9), fontsize=10, fontweight='bold', ha='center', color='black')
-        ax.set_xticks(pd.date_range(start=dataset['Periods'].min(), end=dataset['Periods'].max(), freq='2YS'))
-        ax.tick_params(axis='x', which='both', direction='out', bottom=True)
-        for spine in ax.spines.values():
-            spine.set_visible(False)
-        ax.legend(loc='upper left', fontsize=10, frameon=True, edgecolor='black')
-        ax.grid(False)
-        fig.tight_layout(pad=1.5)
-        st.pyplot(fig)
+    if 'Job Vacancy-to-Unemployment Ratio' in monthly:
+        future = submit_chart(vacancy_unemployment_chart, monthly.series('Job Vacancy-to-Unemployment Ratio'))
+        if future.done() and future.exception() is None:
+            st.image(future.result(), use_container_width=True)
+        else:
+            render_pending_chart(future)
 
     # Layoff/quit transitions
     transition_columns = {
@@ -232,58 +304,59 @@ with tabs[4]:
     }
     color_map = {'Layoff': 'red', 'Quit': 'green'}
     line_style_map = {'Prime-Age': 'dash', 'All': 'solid'}
-    if df_monthly is not None:
-        valid_cols = [label for label in transition_columns if label in df_monthly.columns]
-        if valid_cols:
-            df_transitions = df_monthly[valid_cols].dropna()
-            fig_transitions = go.Figure()
-            for col in valid_cols:
-                label_short = col.split('Monthly Transition Rate of ')[-1]
-                is_prime = 'Prime-Age' in label_short
-                is_layoff = 'Layoff' in label_short
-                color = color_map['Layoff'] if is_layoff else color_map['Quit']
-                line_dash = line_style_map['Prime-Age'] if is_prime else line_style_map['All']
-                fig_transitions.add_trace(go.Scatter(
-                    x=df_transitions.index, y=df_transitions[col], mode='lines',
-                    name=label_short, line=dict(color=color, width=3, dash=line_dash)
-                ))
-            wrapped_title = "<br>".join(textwrap.wrap(
-                "Layoffs vs. Quits: The Push and Pull of the Labor Market", 70))
-            dates = pd.to_datetime(df_transitions.index)
-            tickvals = [date for date in dates if date.month in [1, 7] and date.day == 1]
-            fig_transitions.update_layout(
-                title=dict(text=wrapped_title, x=0.35, font=dict(size=16, family="Times New Roman")),
-                xaxis=dict(title="Date", showline=True, linecolor='black', tickvals=tickvals, tickformat="%b %Y", tickangle=45, tickfont=dict(size=12, family="Times New Roman"), showgrid=False),
-                yaxis=dict(title="Transition Rate (%)", showline=True, linecolor='black', showgrid=False, gridcolor='lightgray', zeroline=False),
-                plot_bgcolor='white', paper_bgcolor='white', font=dict(family="Times New Roman", size=14),
-                hovermode="x unified", height=500, width=900,
-                margin=dict(l=50, r=150, t=70, b=70),
-                legend=dict(font=dict(size=12), orientation="v", yanchor="top", y=0.95, xanchor="right", x=0.38, bgcolor='rgba(255,255,255,0.9)', bordercolor='black', borderwidth=1)
-            )
-            st.plotly_chart(fig_transitions, use_container_width=True)
-
-    # Claims and layoff overlay
-    df_weekly_filtered = df_weekly[[
-        'Continued Claims (Insured Unemployment)',
-        '4-Week Moving Average of Continued Claims (Insured Unemployment)'
-    ]].dropna()
+    valid_cols = [label for label in transition_columns if label in monthly]
+    if valid_cols:
+        df_transitions = monthly.view(valid_cols).dropna()
+        fig_transitions = go.Figure()
+        for col in valid_cols:
+            label_short = col.split('Monthly Transition Rate of ')[-1]
+            is_prime = 'Prime-Age' in label_short
+            is_layoff = 'Layoff' in label_short
+            color = color_map['Layoff'] if is_layoff else color_map['Quit']
+            line_dash = line_style_map['Prime-Age'] if is_prime else line_style_map['All']
+            fig_transitions.add_trace(go.Scatter(
+                x=df_transitions.index, y=df_transitions[col], mode='lines',
+                name=label_short, line=dict(color=color, width=3, dash=line_dash)
+            ))
+        wrapped_title = "<br>".join(textwrap.wrap(
+            "Layoffs vs. Quits: The Push and Pull of the Labor Market", 70))
+        dates = pd.to_datetime(df_transitions.index)
+        tickvals = [date for date in dates if date.month in [1, 7] and date.day == 1]
+        fig_transitions.update_layout(
+            title=dict(text=wrapped_title, x=0.35, font=dict(size=16, family="Times New Roman")),
+            xaxis=dict(title="Date", showline=True, linecolor='black', tickvals=tickvals, tickformat="%b %Y", tickangle=45, tickfont=dict(size=12, family="Times New Roman"), showgrid=False),
+            yaxis=dict(title="Transition Rate (%)", showline=True, linecolor='black', showgrid=False, gridcolor='lightgray', zeroline=False),
+            plot_bgcolor='white', paper_bgcolor='white', font=dict(family="Times New Roman", size=14),
+            hovermode="x unified", height=500, width=900,
+            margin=dict(l=50, r=150, t=70, b=70),
+            legend=dict(font=dict(size=12), orientation="v", yanchor="top", y=0.95, xanchor="right", x=0.38, bgcolor='rgba(255,255,255,0.9)', bordercolor='black', borderwidth=1)
+        )
+        st.plotly_chart(fig_transitions, use_container_width=True)
+
+    # Claims and layoff overlay, on one weekly axis: the monthly layoff rate is
+    # aligned to the claims weeks as of each week's end
+    claims_key = 'Continued Claims (Insured Unemployment)'
+    claims_4w_key = '4-Week Moving Average of Continued Claims (Insured Unemployment)'
     transition_key = 'Monthly Transition Rate of All U.S. Workers From Employment to Non-Employment Due to a Layoff'
-    transition_series = df_monthly[[transition_key]].dropna()
+    overlay = align(stores, [claims_key, claims_4w_key, transition_key], "weekly", "end")
+    continued_claims = downsample(overlay[claims_key])
+    continued_claims_4w = downsample(overlay[claims_4w_key])
+    transition_series = downsample(overlay[transition_key])
     fig = go.Figure()
     fig.add_trace(go.Scatter(
-        x=df_weekly_filtered.index, y=df_weekly_filtered['Continued Claims (Insured Unemployment)'],
+        x=continued_claims.index, y=continued_claims,
         name='Continued Claims', line=dict(color='crimson', width=3),
         hovertemplate='%{x|%Y-%m-%d}<br>Claims: %{y:,.0f}<extra></extra>'
     ))
     fig.add_trace(go.Scatter(
-        x=df_weekly_filtered.index, y=df_weekly_filtered['4-Week Moving Average of Continued Claims (Insured Unemployment)'],
+        x=continued_claims_4w.index, y=continued_claims_4w,
         name='4-Week Moving Avg', line=dict(color='blue', dash='dash', width=3),
         hovertemplate='%{x|%Y-%m-%d}<br>4W Avg: %{y:,.0f}<extra></extra>'
     ))
     fig.add_trace(go.Scatter(
-        x=transition_series.index, y=transition_series[transition_key],
+        x=transition_series.index, y=transition_series,
         name='Layoff Transition Rate', yaxis='y2', line=dict(color='darkgreen', width=2),
-        hovertemplate='%{x|%Y-%m}<br>Rate: %{y:.2f}%<extra></extra>'
+        hovertemplate='%{x|%Y-%m-%d}<br>Rate: %{y:.2f}%<extra></extra>'
     ))
     fig.add_vrect(
         x0="2020-03-01", x1="2020-05-01",
@@ -302,74 +375,190 @@ with tabs[4]:
     st.plotly_chart(fig, use_container_width=True)
 
 # 6. Custom Charts
-with tabs[5]:
+@st.fragment
+def render_custom_charts(stores):
     st.subheader("Build Your Own Charts")
-    freq = st.radio("Choose frequency:", ["Quarterly", "Monthly", "Weekly"], horizontal=True)
-    df, chart_func = {
-        "Quarterly": (df_quarterly, plot_quarterly_line_chart),
-        "Monthly": (df_monthly, plot_monthly_line_chart),
-        "Weekly": (df_weekly, plot_weekly_line_chart),
-    }[freq]
-    if df is not None:
-        missing_or_empty = [col for col in df.columns if df[col].isna().all()]
-        if missing_or_empty:
-            st.warning(f"The following variables have no data and won't plot: {missing_or_empty}")
-        available_vars = [col for col in df.columns if not df[col].isna().all()]
-        selected = st.multiselect("Select variables to plot:", options=available_vars)
-        for var in selected:
-            if var in df.columns:
-                show_metric_with_change(df, var, var)
-                fig = chart_func(df, [var], title=var)
-                fig.update_yaxes(title_text=get_yaxis_label(var))
-                st.plotly_chart(fig, use_container_width=True, key=f"custom_{freq}_{var}")
-            else:
-                st.warning(f"Column '{var}' not found in the {freq} data.")
+    freq = st.radio("Choose frequency:", ["Quarterly", "Monthly", "Weekly", "Mixed"], horizontal=True)
+    if freq == "Mixed":
+        render_mixed_frequency_chart(stores)
+        return
+    store, chart_func = stores[freq.lower()], CHART_FUNCS[freq.lower()]
+    available_vars = store.nonempty_columns()
+    missing_or_empty = [col for col in store.columns if col not in available_vars]
+    if missing_or_empty:
+        st.warning(f"The following variables have no data and won't plot: {missing_or_empty}")
+    selected = st.multiselect("Select variables to plot:", options=available_vars)
+    visible_range = None
+    if selected:
+        first_date, last_date = (date.date() for date in store.date_range())
+        zoom = st.slider("Visible range:", min_value=first_date, max_value=last_date, value=(first_date, last_date))
+        # full resolution is only sent for the zoomed window
+        if zoom != (first_date, last_date):
+            visible_range = zoom
+    display = st.radio("Display:", ["Separate charts", "Overlay"], horizontal=True, key="custom_display",
+                       help="Overlay draws every selected series in one WebGL chart")
+    if selected and display == "Overlay":
+        render_overlay_chart(store.view(selected), selected, freq, visible_range)
+        return
+    for var in selected:
+        if var in store:
+            show_metric_with_change(var, var)
+            fig = chart_func(store.view([var]), [var], title=var, yaxis_title=get_yaxis_label(var), visible_range=visible_range)
+            st.plotly_chart(fig, use_container_width=True, key=f"custom_{freq}_{var}")
+        else:
+            st.warning(f"Column '{var}' not found in the {freq} data.")
+
+NORMALIZATION_LABELS = {None: "None", "index": "Index (first = 100)", "zscore": "Z-score"}
+
+# All selected series in one figure, optionally normalized or each on its own y-axis
+def render_overlay_chart(df, selected, freq, visible_range):
+    col1, col2 = st.columns(2)
+    normalize = col1.radio("Normalize:", OVERLAY_NORMALIZATIONS, format_func=NORMALIZATION_LABELS.get,
+                           horizontal=True, key="custom_normalize")
+    independent_axes = col2.checkbox("Independent y-axes", key="custom_independent_axes")
+    title = " vs ".join(selected) if len(selected) <= 3 else f"{len(selected)} {freq.lower()} series"
+    fig = plot_overlay_chart(df, selected, title=title, frequency=freq.lower(), yaxis_title=get_yaxis_label(selected[0]),
+                             normalize=normalize, independent_axes=independent_axes, visible_range=visible_range)
+    st.plotly_chart(fig, use_container_width=True, key=f"custom_overlay_{freq}")
+
+# Series of any frequency on one chart, aligned to a common target frequency
+def render_mixed_frequency_chart(stores):
+    options = [col for store in stores.values() for col in store.nonempty_columns()]
+    selected = st.multiselect("Select variables to plot:", options=options, key="mixed_vars")
+    target = st.radio("Align to:", ["Quarterly", "Monthly", "Weekly"], index=1, horizontal=True, key="mixed_target")
+    method = st.radio("Aggregation:", METHODS, horizontal=True, key="mixed_method",
+                      help="mean/last/sum within each period; end carries the latest value forward")
+    if selected:
+        frequency = target.lower()
+        aligned = align(stores, selected, frequency, method)
+        title = " vs ".join(selected) if len(selected) <= 3 else f"{len(selected)} series ({target}, {method})"
+        fig = CHART_FUNCS[frequency](aligned, selected, title=title, yaxis_title=get_yaxis_label(selected[0]))
+        st.plotly_chart(fig, use_container_width=True, key="custom_mixed")
+
+# 7. Analytics
+@st.fragment
+def render_analytics(stores):
+    st.subheader("Rolling Analytics")
+    basis = st.radio("Frequency basis:", ["Monthly", "Quarterly", "Weekly"], horizontal=True, key="analytics_basis")
+    window = st.select_slider("Window (periods):", options=[12, 24, 36, 60, 120], value=36, key="analytics_window")
+    frequency = basis.lower()
+    data = basis_frame(stores, frequency)
+    if data.empty:
+        st.info("No data loaded.")
+        return
+
+    # Where every series sits within its own recent history
+    zscores = analyze(stores, "zscores", frequency, window)
+    ranks = analyze(stores, "ranks", frequency, window)
+    latest_z, latest_rank = zscores.ffill().iloc[-1], ranks.ffill().iloc[-1]
+    readings = pd.DataFrame({
+        "z-score": latest_z,
+        "percentile": latest_rank * 100,
+        "regime": regimes(latest_z).map({1.0: "elevated", -1.0: "depressed", 0.0: "normal"}),
+    }).dropna(subset=["z-score"])
+    st.markdown(f"**Latest readings vs the trailing {window} {frequency} periods**")
+    st.dataframe(readings.reindex(readings["z-score"].abs().sort_values(ascending=False).index).round(2),
+                 use_container_width=True)
+
+    # Correlation matrix for the window ending on a chosen date
+    first_date, last_date = data.index[min(window, len(data)) - 1].date(), data.index[-1].date()
+    end = st.slider("Window ending:", min_value=first_date, max_value=last_date, value=last_date, key="analytics_end")
+    corr = analyze(stores, "correlation", frequency, window, end=pd.Timestamp(end), min_periods=window // 2)
+    corr = corr.dropna(how="all").dropna(axis=1, how="all")
+    fig = go.Figure(go.Heatmap(z=corr.to_numpy(), x=corr.columns, y=corr.index, zmin=-1, zmax=1, colorscale="RdBu"))
+    fig.update_layout(title=dict(text=f"{window}-period correlations ending {end:%b %Y}", x=0.5),
+                      height=max(450, 14 * len(corr)), xaxis=dict(showticklabels=len(corr) <= 60))
+    st.plotly_chart(fig, use_container_width=True, key="analytics_corr")
+
+    # Rolling correlation of one series against others
+    target = st.selectbox("Rolling correlation of:", list(data.columns), key="analytics_target")
+    pair = analyze(stores, "pair", frequency, window, target=target, min_periods=window // 2)
+    strongest = corr[target].drop(target).abs().sort_values(ascending=False).index[:3] if target in corr else []
+    others = st.multiselect("With:", [col for col in data.columns if col != target], default=list(strongest),
+                            key="analytics_others")
+    if others:
+        fig = CHART_FUNCS[frequency](pair, others, title=f"Rolling {window}-period correlation with {target}",
+                                     yaxis_title="Correlation")
+        st.plotly_chart(fig, use_container_width=True, key="analytics_pair")
+
+SECTIONS = {
+    "Labor Market": render_labor_market,
+    "Monetary Metrics": render_monetary_metrics,
+    "Fiscal Metrics": render_fiscal_metrics,
+    "Debtonomics": render_debtonomics,
+    "Workforce Flows": render_workforce_flows,
+    "Custom Charts": render_custom_charts,
+    "Analytics": render_analytics,
+}
+section = st.radio("Section", list(SECTIONS), horizontal=True, label_visibility="collapsed", key="section")
+with span("tab_render", tab=section):
+    SECTIONS[section](stores)
+
+# Export widgets run as a fragment; the export bytes are cached per data
+# version and selection, so nothing is reserialized on ordinary reruns. The
+# frame for a selection not exported yet is only built on request.
+@st.fragment
+def render_export_tools(stores):
+    stores = {label: store for label, store in stores.items() if store.date_range()[0] is not None}
+    if not stores:
+        return
+    label = st.selectbox("Dataset", list(stores), key="export_dataset")
+    fmt = st.selectbox("Format", list(EXPORT_FORMATS), key="export_format")
+    store = stores[label]
+    columns = st.multiselect("Columns (all if empty)", store.columns, key=f"export_columns_{label}")
+    first_date, last_date = (date.date() for date in store.date_range())
+    date_range = st.date_input("Date range", value=(first_date, last_date), min_value=first_date,
+                               max_value=last_date, key=f"export_dates_{label}")
+    start, end = (date_range + (None,))[:2] if isinstance(date_range, tuple) else (date_range, None)
+    if (start, end) == (first_date, last_date):
+        start, end = None, None
+    selection = (fmt, columns, start and pd.Timestamp(start), end and pd.Timestamp(end))
+    data = cached_export(store.attrs.get("data_version"), *selection)
+    if data is None:
+        if not st.button(f"Prepare {label} Data ({fmt})", key="export_prepare"):
+            return
+        data = export_bytes(store.view(columns or None), *selection)
+    st.download_button(
+        label=f"⬇️ Download {label} Data ({fmt})",
+        data=data,
+        file_name=export_file_name(label, fmt),
+        mime=EXPORT_FORMATS[fmt][1]
+    )
 
 with st.sidebar:
     with st.expander("📂 Download & Manage Data", expanded=True):
         st.markdown("### Dataset Tools")
-        monthly_df = st.session_state.get("df_monthly")
-        quarterly_df = st.session_state.get("df_quarterly")
-        weekly_df = st.session_state.get("df_weekly")
+        (quarterly_start, quarterly_end), (monthly_start, monthly_end), (weekly_start, weekly_end) = (
+            stores[frequency].date_range() for frequency in FREQUENCY_NAMES)
         monthly_range = (
-            f"{monthly_df.index.min().strftime('%b %Y')} → {monthly_df.index.max().strftime('%b %Y')}"
-            if monthly_df is not None and not monthly_df.empty else "No monthly data available"
+            f"{monthly_start.strftime('%b %Y')} → {monthly_end.strftime('%b %Y')}"
+            if monthly_start is not None else "No monthly data available"
+        )
+        quarterly_range = (
+            f"{quarterly_start.strftime('%b %Y')} → {quarterly_end.strftime('%b %Y')}"
+            if quarterly_start is not None else "No quarterly data available"
         )
-        if quarterly_df is not None and not quarterly_df.empty:
-            if getattr(quarterly_df.index, "freqstr", None) and 'Q' in quarterly_df.index.freqstr:
-                quarterly_range = f"{quarterly_df.index.min().year} Q{quarterly_df.index.min().quarter} → {quarterly_df.index.max().year} Q{quarterly_df.index.max().quarter}"
-            else:
-                quarterly_range = f"{quarterly_df.index.min().strftime('%b %Y')} → {quarterly_df.index.max().strftime('%b %Y')}"
-        else:
-            quarterly_range = "No quarterly data available"
         weekly_range = (
-            f"{weekly_df.index.min().strftime('%d %b %Y')} → {weekly_df.index.max().strftime('%d %b %Y')}"
-            if weekly_df is not None and not weekly_df.empty else "No weekly data available"
+            f"{weekly_start.strftime('%d %b %Y')} → {weekly_end.strftime('%d %b %Y')}"
+            if weekly_start is not None else "No weekly data available"
         )
         st.caption(f"📅 Monthly data range: {monthly_range}")
         st.caption(f"📅 Quarterly data range: {quarterly_range}")
         st.caption(f"📅 Weekly data range: {weekly_range}")
-        if monthly_df is not None and not monthly_df.empty:
-            st.download_button(
-                label="⬇️ Download Monthly Data (CSV)",
-                data=monthly_df.to_csv().encode('utf-8'),
-                file_name="monthly_data.csv",
-                mime="text/csv"
-            )
-        if quarterly_df is not None and not quarterly_df.empty:
-            st.download_button(
-                label="⬇️ Download Quarterly Data (CSV)",
-                data=quarterly_df.to_csv().encode('utf-8'),
-                file_name="quarterly_data.csv",
-                mime="text/csv"
-            )
-        if weekly_df is not None and not weekly_df.empty:
-            st.download_button(
-                label="⬇️ Download Weekly Data (CSV)",
-                data=weekly_df.to_csv().encode('utf-8'),
-                file_name="weekly_data.csv",
-                mime="text/csv"
-            )
+        render_export_tools({"Monthly": stores["monthly"], "Quarterly": stores["quarterly"], "Weekly": stores["weekly"]})
+        footprint = memory_report(stores)
+        st.caption("🧠 In-memory footprint: " + ", ".join(
+            f"{frequency} {row.compact_mb:.2f} MB ({row.observations:,.0f} obs)" for frequency, row in footprint.iterrows()
+        ))
+        refreshed_at = snapshot_meta(data_version).get("refreshed_at", {})
+        st.caption("🔁 Refreshed: " + ", ".join(
+            f"{frequency} {format_age(time.time() - refreshed_at[frequency])} ago"
+            for frequency in FREQUENCY_NAMES if frequency in refreshed_at
+        ))
+        stale = latest[latest["stale"]]
+        st.caption(f"🕒 {len(stale)} of {len(latest)} series have no recent observation.")
+        if not stale.empty and st.checkbox("Show stale series", key="show_stale"):
+            st.dataframe(stale[["frequency", "last_date", "staleness_days"]].sort_values("staleness_days", ascending=False))
     with st.expander("📣 We’re Listening!", expanded=False):
         st.markdown("### Feedback & Support")
         st.markdown("""
@@ -387,3 +576,6 @@ with st.sidebar:
                     f.write(f"\n---\nType: {feedback_type}\nMessage: {feedback_text}\n")
             else:
                 st.error("❗ Please enter a message before submitting.")
+
+# Prometheus metrics file for ops (only when MACRO_METRICS_FILE is set)
+write_metrics()
@@ -0,0 +1,89 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from series_store import DEFAULT_STORE_DIR
+
+# Vintage store for revised series. ALFRED reports each observation value
+# together with the real-time interval [realtime_start, realtime_end] during
+# which it was the published value, so a value that survives many releases is
+# stored once rather than once per vintage (run-length encoding over vintages).
+# Real-time bounds are kept as int32 day numbers since 1970-01-01, which also
+# covers FRED's open-ended 9999-12-31.
+VINTAGE_DIR = os.path.join(DEFAULT_STORE_DIR, "vintages")
+EPOCH = np.datetime64("1970-01-01", "D")
+
+
+def to_day_number(dates):
+    return (np.asarray(dates, dtype="datetime64[D]") - EPOCH).astype("int32")
+
+
+class VintageStore:
+    def __init__(self, root=VINTAGE_DIR):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+        self._arrays = {}
+        self._lock = threading.Lock()
+
+    def _path(self, code):
+        return os.path.join(self.root, f"{code}.parquet")
+
+    def has(self, code):
+        return os.path.exists(self._path(code))
+
+    # vintages: DataFrame with date, value, realtime_start, realtime_end
+    # (the last two as dates or ISO strings, as returned by ALFRED)
+    def write(self, code, vintages):
+        frame = pd.DataFrame({
+            "date": pd.to_datetime(vintages["date"]),
+            "value": pd.to_numeric(vintages["value"], errors="coerce").astype("float64"),
+            "realtime_start": to_day_number(vintages["realtime_start"]),
+            "realtime_end": to_day_number(vintages["realtime_end"]),
+        }).sort_values(["date", "realtime_start"], ignore_index=True)
+        tmp_path = self._path(code) + ".tmp"
+        frame.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, self._path(code))
+        with self._lock:
+            self._arrays.pop(code, None)
+        return frame
+
+    # Arrays for a series, loaded from disk once and kept in memory
+    def _load(self, code):
+        with self._lock:
+            arrays = self._arrays.get(code)
+        if arrays is None:
+            if not self.has(code):
+                return None
+            frame = pd.read_parquet(self._path(code))
+            arrays = (
+                frame["date"].to_numpy(dtype="datetime64[ns]"),
+                frame["value"].to_numpy(),
+                frame["realtime_start"].to_numpy(),
+                frame["realtime_end"].to_numpy(),
+            )
+            with self._lock:
+                self._arrays[code] = arrays
+        return arrays
+
+    # The series as it was published on `date`
+    def series_as_of(self, code, date):
+        arrays = self._load(code)
+        if arrays is None:
+            return None
+        dates, values, start, end = arrays
+        day = to_day_number(pd.Timestamp(date).to_datetime64())
+        mask = (start <= day) & (end >= day)
+        return pd.Series(values[mask], index=pd.DatetimeIndex(dates[mask]), dtype="float64")
+
+    # Wide frame of {name: code} as it looked on `date`. Series without stored
+    # vintages come back as empty columns.
+    def frame_as_of(self, series_dict, date):
+        data = {}
+        for name, code in series_dict.items():
+            series = self.series_as_of(code, date)
+            data[name] = series if series is not None else pd.Series(dtype="float64")
+        df = pd.DataFrame(data)
+        df.index = pd.to_datetime(df.index)
+        return df